@@ -1,7 +1,9 @@
 
 # -*- coding: utf-8 -*-
-import streamlit as st
-from lib import fetch_all_markets
+import uuid
+import streamlit as st, pandas as pd
+from lib import (market_snapshot, snapshot_age, invalidate, set_profiling, timing_mark, timings_since,
+                 timing_stats, timings_jsonl)
 
 st.set_page_config(page_title="Dash Boursier v5.3 PRO+", layout="wide", initial_sidebar_state="expanded")
 
@@ -22,20 +24,41 @@ with st.sidebar:
     st.header("⚙️ Paramètres")
     profil = st.radio("🎯 Profil d’investisseur", ["Agressif","Neutre","Prudent"], index=1)
     if st.button("🔄 Rafraîchir les données"):
-        st.cache_data.clear(); st.rerun()
+        invalidate(); st.rerun()
+    profiling = st.checkbox("⏱️ Profilage des étapes", value=False)
 st.session_state["profil"]=profil
+st.session_state.setdefault("profiling_owner", uuid.uuid4().hex)
+set_profiling(profiling, owner=st.session_state["profiling_owner"])  # les autres sessions gardent leur choix
+mark = timing_mark()
 
 st.title("💹 Dash Boursier v5.3 PRO+ — Accueil")
 st.caption("IA partout + seuils Entrée/Stop/Objectif (MA20/MA50) + convertisseur LS→Yahoo + profil investisseur.")
 
 try:
-    data = fetch_all_markets([("CAC 40",""),("DAX 40",""),("NASDAQ 100",""),("S&P 500",""),("Dow Jones","")], days_hist=30)
+    snap = market_snapshot(30)
+    data = snap["data"]
     if not data.empty and "pct_1d" in data:
         avg = (data["pct_1d"].mean()*100)
         up = int((data["pct_1d"]>0).sum())
         dn = int((data["pct_1d"]<0).sum())
         st.markdown(f"**Résumé global (Jour)** — Variation moyenne : {avg:.2f}% — {up} hausses / {dn} baisses")
+        st.caption(f"Données calculées il y a {snapshot_age(snap)/60:.0f} min.")
     else:
         st.info("Les données Yahoo Finance sont momentanément indisponibles.")
 except Exception as e:
     st.warning(f"Problème de chargement initial: {e}")
+
+if profiling:
+    with st.sidebar.expander("⏱️ Temps par étape", expanded=True):
+        recs = pd.DataFrame(timings_since(mark, scope=mark))
+        if recs.empty:
+            st.caption("Aucune étape mesurée pendant ce rendu (instantané déjà prêt).")
+        else:
+            st.caption("Ce rendu")
+            st.dataframe(recs.groupby("stage")["ms"].agg(["count","sum"]).round(1).sort_values("sum", ascending=False),
+                         use_container_width=True)
+        stats = timing_stats()
+        if not stats.empty:
+            st.caption("Fenêtre glissante, toutes sessions du process (percentiles, ms)")
+            st.dataframe(stats.set_index("stage").round(1), use_container_width=True)
+            st.download_button("Exporter (JSON lines)", timings_jsonl(), file_name="timings.jsonl", mime="application/json")
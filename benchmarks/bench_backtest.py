@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Backtest vectorisé (dates × tickers) : contrôle contre une version ligne à ligne
+(rolling pandas par ticker + decision_label_from_row + price_levels_from_row) sur une
+petite série synthétique, puis durée sur l’univers des cinq indices (marché synthétique).
+
+    python benchmarks/bench_backtest.py [--check 40 400] [--tickers 650 5000] [--years 10]
+"""
+import os, sys, time, argparse
+import numpy as np, pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0]=[os.path.dirname(HERE), HERE]
+import lib
+from fakes import FakeMarket, offline
+from bench_metrics import synthetic_prices
+
+
+def reference(px: pd.DataFrame, profile: str, horizon: int) -> pd.DataFrame:
+    """Même règles, un ticker et une barre à la fois."""
+    vol_max=lib.get_profile_params(profile)["vol_max"]
+    out=[]
+    for t,g in px.sort_values("Date").groupby("Ticker"):
+        g=g.reset_index(drop=True)
+        prev=g["Close"].shift(1)
+        tr=np.maximum(g["High"]-g["Low"], np.maximum((g["High"]-prev).abs(), (g["Low"]-prev).abs()))
+        g["ATR14"]=tr.rolling(14, min_periods=5).mean()
+        g["MA20"]=g["Close"].rolling(20, min_periods=5).mean()
+        g["MA50"]=g["Close"].rolling(50, min_periods=10).mean()
+        state, lv, fill, opened, held = 0, None, None, None, 0
+        for i,row in g.iterrows():
+            o, h, l, c = row["Open"], row["High"], row["Low"], row["Close"]
+            filled=False
+            if state==1:
+                if l<=lv["entry"]: fill=min(o, lv["entry"]); opened=row["Date"]; held=0; state=2; filled=True
+                else: state=0
+            if state==2:
+                held+=0 if filled else 1
+                ref=fill if filled else o
+                if l<=lv["stop"]: why, px_out = "stop", min(ref, lv["stop"])
+                elif h>=lv["target"]: why, px_out = "objectif", max(ref, lv["target"])
+                elif held>=horizon: why, px_out = "durée", c
+                else: why=None
+                if why:
+                    out.append((t, opened, row["Date"], fill, px_out, why)); state=0
+            if state==0 and lib.decision_label_from_row(row, held=False, vol_max=vol_max)=="🟢 Acheter":
+                lv=lib.price_levels_from_row(row, profile); state=1
+    return pd.DataFrame(out, columns=["Ticker","Entrée","Sortie","Prix entrée","Prix sortie","Sortie par"])
+
+
+def check(n, bars, horizon):
+    px=synthetic_prices(n, bars, seed=3)
+    px["Open"]=px["Close"].shift(1).fillna(px["Close"])
+    px[["Open","High","Low","Close"]]=px[["Open","High","Low","Close"]].astype(np.float32).astype(float)
+    panel=lib.PricePanel.from_long(px)
+    _, trades, _ = lib.backtest(panel, horizon=horizon)
+    key=["Ticker","Entrée","Sortie","Sortie par"]
+    for prof in lib.PROFILE_PARAMS:
+        got=trades[trades["Profil"]==prof].sort_values(key).reset_index(drop=True)
+        ref=reference(px, prof, horizon).sort_values(key).reset_index(drop=True)
+        assert len(got)==len(ref), f"{prof} : {len(got)} transactions vs {len(ref)}"
+        assert (got[key].astype(str).values==ref[key].astype(str).values).all(), f"{prof} : transactions différentes"
+        assert np.allclose(got["Prix sortie"], ref["Prix sortie"], rtol=1e-6), f"{prof} : prix de sortie"
+        print(f"contrôle {prof:<9}: {len(got)} transactions identiques à la version ligne à ligne")
+
+
+def main():
+    ap=argparse.ArgumentParser()
+    ap.add_argument("--check", type=int, nargs=2, default=[40, 400], metavar=("TICKERS", "BARS"))
+    ap.add_argument("--tickers", type=int, nargs="+", default=[650, 5000])
+    ap.add_argument("--years", type=float, default=10)
+    ap.add_argument("--horizon", type=int, default=lib.BACKTEST_HORIZON)
+    args=ap.parse_args()
+    check(*args.check, args.horizon)
+    for n in args.tickers:
+        with offline(FakeMarket(n)):
+            plan, union = lib._plan_market_fetch(lib.ALL_MARKETS)
+            panel=lib.fetch_panel(union, days=int(args.years*365.25))
+            t0=time.perf_counter()
+            summary, trades, _ = lib.backtest(panel, {i: list(m["ticker"]) for i,m in plan}, horizon=args.horizon)
+            secs=time.perf_counter()-t0
+        print(f"{panel.shape[1]:>5} tickers × {panel.shape[0]} séances × {len(lib.PROFILE_PARAMS)} profils : "
+              f"{secs:5.2f} s · {len(trades)} transactions")
+    with pd.option_context("display.width", 200, "display.max_columns", 20, "display.precision", 3):
+        print(summary.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
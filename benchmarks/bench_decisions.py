@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Décisions & seuils vectorisés vs. version ligne à ligne (iterrows), avec vérification
+d’égalité exacte sur des lignes aléatoires (NaN, PRU, cas limites inclus).
+
+    python benchmarks/bench_decisions.py [--rows 650] [--checks 20]
+"""
+import os, sys, time, argparse
+import numpy as np, pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib import (decision_label_from_row, price_levels_from_row, decision_labels, price_levels,
+                 PROFILE_PARAMS)
+
+
+def random_metrics(n: int, seed: int = 0, with_pru: bool = True) -> pd.DataFrame:
+    rng=np.random.default_rng(seed)
+    px=np.round(rng.lognormal(4, 1, n), int(rng.integers(0, 4)))  # prix « ronds » → quasi-égalités d’arrondi
+    def noisy(scale):
+        v=px*(1+rng.normal(0, scale, n)); v[rng.random(n)<0.1]=np.nan
+        return v
+    df=pd.DataFrame({"Ticker":[f"T{i}" for i in range(n)], "Close":px,
+                     "MA20":noisy(0.05), "MA50":noisy(0.08), "ATR14":np.abs(noisy(1))*0.04})
+    eq=rng.random(n)<0.1; df.loc[eq, "MA20"]=df.loc[eq, "Close"]   # px == MA20 exactement
+    df.loc[rng.random(n)<0.03, "Close"]=np.nan
+    if with_pru:
+        pru=px*(1+rng.normal(0, 0.05, n)); pru[rng.random(n)<0.2]=np.nan; pru[rng.random(n)<0.05]=0.0
+        df["PRU"]=pru
+    return df
+
+
+def per_row(df, held, vol_max, profile):
+    labels=[decision_label_from_row(r, held=held, vol_max=vol_max) for _,r in df.iterrows()]
+    levels=[price_levels_from_row(r, profile) for _,r in df.iterrows()]
+    return labels, pd.DataFrame(levels, index=df.index)
+
+
+def check(df, held, profile):
+    vol_max=PROFILE_PARAMS[profile]["vol_max"]
+    labels, levels = per_row(df, held, vol_max, profile)
+    assert decision_labels(df, held=held, vol_max=vol_max).tolist()==labels
+    pd.testing.assert_frame_equal(price_levels(df, profile), levels[["entry","target","stop"]], check_exact=True)
+
+
+def main():
+    ap=argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=650)
+    ap.add_argument("--checks", type=int, default=20)
+    args=ap.parse_args()
+    for seed in range(args.checks):
+        df=random_metrics(500, seed, with_pru=bool(seed%2))
+        for held in (False, True):
+            for profile in PROFILE_PARAMS: check(df, held, profile)
+    print(f"égalité exacte vérifiée sur {args.checks} tirages × 2 modes × {len(PROFILE_PARAMS)} profils")
+    df=random_metrics(args.rows, 42)
+    t0=time.perf_counter(); per_row(df, False, 0.05, "Neutre"); t_row=time.perf_counter()-t0
+    t0=time.perf_counter(); decision_labels(df, vol_max=0.05); price_levels(df, "Neutre"); t_vec=time.perf_counter()-t0
+    print(f"{args.rows} lignes : iterrows {t_row*1e3:.1f} ms · vectorisé {t_vec*1e3:.2f} ms · ×{t_row/t_vec:.0f}")
+
+
+if __name__ == "__main__":
+    main()
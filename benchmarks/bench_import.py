@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Latence d’import de `lib` (démarrage à froid de chaque page Streamlit), via `python -X importtime`.
+
+    python benchmarks/bench_import.py [--runs 5] [--max-ms 800]
+
+Avec --max-ms, le script sort en erreur si la médiane dépasse le seuil (garde-fou CI).
+"""
+import os, sys, re, argparse, subprocess, statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("yfinance", "nltk", "requests", "streamlit")
+
+
+def import_profile() -> dict:
+    """Temps cumulé (µs) d’un `import lib` à froid et de chacun de ses imports directs."""
+    r=subprocess.run([sys.executable, "-X", "importtime", "-c", "import lib"], cwd=ROOT,
+                     capture_output=True, text=True, check=True)
+    children, out = {}, {}
+    for line in r.stderr.splitlines():
+        m=re.match(r"import time:\s+\d+ \|\s+(\d+) \|( +)(\S+)", line)
+        if not m: continue
+        depth=(len(m.group(2))-1)//2; us=int(m.group(1)); name=m.group(3)
+        if depth==1: children[name]=us
+        elif depth==0:
+            if name=="lib": out=dict(children, lib=us)
+            children={}
+    return out
+
+
+def main():
+    ap=argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--max-ms", type=float, default=None)
+    args=ap.parse_args()
+    runs=[import_profile() for _ in range(args.runs)]
+    total=statistics.median(p.get("lib", 0) for p in runs)/1e3
+    print(f"import lib : médiane {total:.1f} ms sur {args.runs} imports à froid")
+    top=sorted(((m, us) for m, us in runs[-1].items() if m!="lib"), key=lambda kv: -kv[1])[:8]
+    for mod, us in top: print(f"  {mod:<24} {us/1e3:8.1f} ms")
+    loaded=[m for m in HEAVY if m in runs[-1]]
+    if loaded: print(f"  ⚠️ modules lourds importés au démarrage : {', '.join(loaded)}")
+    if args.max_ms is not None and total>args.max_ms:
+        sys.exit(f"import lib trop lent : {total:.1f} ms > {args.max_ms} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""IndicatorState (mise à jour barre par barre) vs. compute_metrics complet à chaque interrogation.
+Rejoue les dernières séances en deux temps (barre provisoire puis définitive) et vérifie
+après chaque passe que les métriques sont identiques au recalcul complet.
+
+    python benchmarks/bench_incremental.py [--bars 250] [--tickers 650 5000] [--replay 10]
+"""
+import os, sys, time, argparse
+import numpy as np, pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib import IndicatorState, compute_metrics, METRIC_COLS
+from bench_metrics import synthetic_prices
+
+
+def same(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    num=METRIC_COLS[2:]
+    return ((a["Ticker"].values==b["Ticker"].values).all()
+            and np.allclose(a[num].to_numpy(float), b[num].to_numpy(float), equal_nan=True, rtol=1e-9))
+
+
+def main():
+    ap=argparse.ArgumentParser()
+    ap.add_argument("--bars", type=int, default=250)
+    ap.add_argument("--tickers", type=int, nargs="+", default=[650, 5000])
+    ap.add_argument("--replay", type=int, default=10, help="séances rejouées barre par barre")
+    args=ap.parse_args()
+    rng=np.random.default_rng(1)
+    for n in args.tickers:
+        px=synthetic_prices(n, args.bars)
+        dates=np.sort(px["Date"].unique()); cut=dates[-args.replay]
+        hist=px[px["Date"]<cut]
+        state=IndicatorState(hist)
+        t_inc=t_full=0.0; polls=0
+        for d in dates[-args.replay:]:
+            bar=px[px["Date"]==d]
+            prov=bar.assign(Close=bar["Close"]*(1+rng.normal(0, 0.005, len(bar))))
+            prov=prov.assign(High=np.maximum(prov["High"], prov["Close"]), Low=np.minimum(prov["Low"], prov["Close"]))
+            for new in (prov, bar):
+                t0=time.perf_counter(); inc=state.update(new).metrics(); t_inc+=time.perf_counter()-t0
+                full_px=pd.concat([hist, new])
+                t0=time.perf_counter(); full=compute_metrics(full_px); t_full+=time.perf_counter()-t0
+                assert same(inc, full), f"écart le {d}"
+                polls+=1
+            hist=pd.concat([hist, bar])
+        print(f"{n:>6} tickers × {args.bars} barres : incrémental {t_inc/polls*1e3:7.1f} ms/interrogation · "
+              f"recalcul {t_full/polls*1e3:7.1f} ms · ×{t_full/t_inc:4.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Pic de RSS du chemin prix → métriques pour l’univers des cinq indices (marché synthétique,
+voir fakes.py) : format long (fetch_prices + compute_metrics) vs. PricePanel (fetch_panel).
+Chaque variante tourne dans un processus neuf, sur un stock disque déjà rempli.
+
+    python benchmarks/bench_memory.py [--tickers 650 5000] [--days 120 1000]
+"""
+import os, sys, time, shutil, argparse, resource, subprocess, tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0]=[os.path.dirname(HERE), HERE]
+VARIANTS = {"long": "fetch_prices", "panel": "fetch_panel"}
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024  # Ko sous Linux
+
+
+def child(variant: str, data_dir: str, n: int, days: int):
+    import lib
+    from fakes import FakeMarket, offline
+    with offline(FakeMarket(n), data_dir=data_dir):
+        _, union = lib._plan_market_fetch(lib.ALL_MARKETS)
+        if variant=="warm":
+            lib.fetch_prices(union, days=days); return
+        base=rss_mb(); t0=time.perf_counter()
+        px=getattr(lib, VARIANTS[variant])(union, days=days)
+        met=lib.compute_metrics(px)
+        secs=time.perf_counter()-t0
+        held=lib.cache_stats()["prices"]["bytes"]/2**20
+        print(f"{rss_mb()-base:.1f} {held:.1f} {secs*1e3:.0f} {len(met)}")
+
+
+def main():
+    ap=argparse.ArgumentParser()
+    ap.add_argument("--tickers", type=int, nargs="+", default=[650, 5000])
+    ap.add_argument("--days", type=int, nargs="+", default=[120, 1000])
+    ap.add_argument("--child", nargs=4, metavar=("VARIANT", "DATA_DIR", "TICKERS", "DAYS"), help=argparse.SUPPRESS)
+    args=ap.parse_args()
+    if args.child:
+        v, d, n, days = args.child; child(v, d, int(n), int(days)); return
+    run=lambda *a: subprocess.run([sys.executable, __file__, "--child", *map(str, a)],
+                                  capture_output=True, text=True, check=True).stdout.split()
+    for n in args.tickers:
+        for days in args.days:
+            data_dir=tempfile.mkdtemp(prefix="dash-mem-")
+            try:
+                run("warm", data_dir, n, days)
+                res={v: run(v, data_dir, n, days) for v in VARIANTS}
+            finally:
+                shutil.rmtree(data_dir, ignore_errors=True)
+            print(f"{n:>5} tickers × {days:>4} j : " + " · ".join(
+                f"{v} pic +{float(r[0]):7.1f} Mo, cache {float(r[1]):6.1f} Mo, {r[2]} ms" for v,r in res.items()))
+
+
+if __name__ == "__main__":
+    main()
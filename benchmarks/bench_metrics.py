@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Benchmark compute_metrics : moteur panel vectorisé vs. version groupby/apply d’origine.
+
+    python benchmarks/bench_metrics.py [--bars 150] [--tickers 500 5000]
+"""
+import os, sys, time, argparse
+import numpy as np, pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib import compute_metrics, METRIC_COLS
+
+
+def synthetic_prices(n_tickers: int, n_bars: int, seed: int = 0) -> pd.DataFrame:
+    """Format long (Date, OHLC, Ticker) comme fetch_prices, avec des trous aléatoires."""
+    rng=np.random.default_rng(seed)
+    dates=pd.bdate_range(end="2024-12-31", periods=n_bars)
+    close=100*np.exp(np.cumsum(rng.normal(0, 0.02, (n_bars, n_tickers)), axis=0))
+    spread=np.abs(rng.normal(0, 0.01, (n_bars, n_tickers)))*close
+    df=pd.DataFrame({
+        "Date": np.repeat(dates.values, n_tickers),
+        "Open": close.ravel(), "High": (close+spread).ravel(), "Low": (close-spread).ravel(),
+        "Close": close.ravel(), "Volume": 1e6,
+        "Ticker": np.tile([f"T{i:05d}" for i in range(n_tickers)], n_bars),
+    })
+    return df.sample(frac=0.97, random_state=seed)  # historiques de longueurs inégales
+
+
+def compute_metrics_legacy(df: pd.DataFrame) -> pd.DataFrame:
+    df=df.copy().sort_values(["Ticker","Date"])
+    df["PrevClose"]=df.groupby("Ticker")["Close"].shift(1)
+    df["TR"]=np.maximum(df["High"]-df["Low"],
+                np.maximum((df["High"]-df["PrevClose"]).abs(), (df["Low"]-df["PrevClose"]).abs()))
+    df["ATR14"]=df.groupby("Ticker")["TR"].transform(lambda s:s.rolling(14,min_periods=5).mean())
+    df["MA20"]=df.groupby("Ticker")["Close"].transform(lambda s:s.rolling(20,min_periods=5).mean())
+    df["MA50"]=df.groupby("Ticker")["Close"].transform(lambda s:s.rolling(50,min_periods=10).mean())
+    def change(s,n): return (s.iloc[-1]/s.iloc[-(n+1)])-1 if len(s)>n else np.nan
+    p1=df.groupby("Ticker")["Close"].apply(lambda x:(x.iloc[-1]/x.iloc[-2])-1 if len(x)>=2 else np.nan).rename("pct_1d")
+    p7=df.groupby("Ticker")["Close"].apply(lambda x:change(x,7)).rename("pct_7d")
+    p30=df.groupby("Ticker")["Close"].apply(lambda x:change(x,22)).rename("pct_30d")
+    last=df.groupby("Ticker").tail(1)[["Ticker","Date","Close","ATR14","MA20","MA50"]]
+    out=(last.merge(p1,left_on="Ticker",right_index=True)
+              .merge(p7,left_on="Ticker",right_index=True)
+              .merge(p30,left_on="Ticker",right_index=True))
+    return out.reset_index(drop=True)
+
+
+def best_of(fn, *args, repeat=3):
+    best=float("inf")
+    for _ in range(repeat):
+        t0=time.perf_counter(); fn(*args); best=min(best, time.perf_counter()-t0)
+    return best
+
+
+def main():
+    ap=argparse.ArgumentParser()
+    ap.add_argument("--bars", type=int, default=150)
+    ap.add_argument("--tickers", type=int, nargs="+", default=[500, 5000])
+    args=ap.parse_args()
+    for n in args.tickers:
+        px=synthetic_prices(n, args.bars)
+        new, old = compute_metrics(px), compute_metrics_legacy(px)
+        assert list(new.columns)==METRIC_COLS
+        num=METRIC_COLS[2:]
+        assert (new["Ticker"].values==old["Ticker"].values).all()
+        assert np.allclose(new[num].to_numpy(float), old[num].to_numpy(float), equal_nan=True, rtol=1e-12)
+        t_new=best_of(compute_metrics, px)
+        t_old=best_of(compute_metrics_legacy, px, repeat=1)
+        print(f"{n:>6} tickers × {args.bars} barres : panel {t_new*1e3:8.1f} ms · "
+              f"groupby {t_old*1e3:8.1f} ms · ×{t_old/t_new:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
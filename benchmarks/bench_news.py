@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""news_summaries contre un faux flux RSS local (http.server sur 127.0.0.1, NEWS_RSS_URL
+redirigé, cache disque dans un dossier temporaire) :
+- requêtes concurrentes (plusieurs en vol, bien plus rapide que la série) ;
+- requête de repli (nom seul) uniquement pour les réponses principales vides ;
+- délai global : les flux lents sont abandonnés, les lignes prêtes sont rendues.
+
+    python benchmarks/bench_news.py [--rows 16] [--latency 0.3]
+"""
+import os, sys, time, shutil, argparse, tempfile, threading, contextlib, urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from xml.sax.saxutils import escape
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0]=[os.path.dirname(HERE), HERE]
+import lib
+
+SLOW = 5.0  # s : réponse des requêtes « LENT », au-delà du délai testé
+
+
+class FeedServer(ThreadingHTTPServer):
+    """Titres fictifs par requête ; « VIDE » dans la requête principale → flux vide,
+    « LENT » → réponse après SLOW s. Compte les requêtes et le maximum en vol."""
+    daemon_threads = True
+
+    def __init__(self, latency):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency=latency; self.queries=[]; self.inflight=0; self.peak=0; self.lock=threading.Lock()
+
+    @property
+    def url(self): return f"http://127.0.0.1:{self.server_address[1]}/rss/search"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        srv=self.server
+        q=urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)["q"][0]
+        with srv.lock:
+            srv.queries.append(q); srv.inflight+=1; srv.peak=max(srv.peak, srv.inflight)
+        try:
+            time.sleep(SLOW if "LENT" in q else srv.latency)
+            empty="VIDE" in q and q.rsplit(" ", 1)[-1].startswith("T")  # seule la requête « nom ticker » est vide
+            items="" if empty else "".join(f"<item><title>{escape(q)} résultats {i}</title><link>https://news.example/{i}</link></item>"
+                                           for i in range(3))
+            body=f"<rss><channel>{items}</channel></rss>".encode("utf-8")
+            self.send_response(200); self.send_header("Content-Length", str(len(body))); self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError): pass
+        finally:
+            with srv.lock: srv.inflight-=1
+
+    def log_message(self, *a): pass
+
+
+@contextlib.contextmanager
+def local_feed(latency):
+    srv=FeedServer(latency)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    data_dir=tempfile.mkdtemp(prefix="dash-news-")
+    saved={k: getattr(lib, k) for k in ("NEWS_RSS_URL", "NEWS_CACHE_PATH", "_NEWS_DB_READY")}
+    lib.NEWS_RSS_URL=srv.url; lib.NEWS_CACHE_PATH=os.path.join(data_dir, "news_cache.sqlite"); lib._NEWS_DB_READY=None
+    try:
+        yield srv
+    finally:
+        for k,v in saved.items(): setattr(lib, k, v)
+        srv.shutdown(); srv.server_close()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    ap=argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=16)
+    ap.add_argument("--latency", type=float, default=0.3, help="latence (s) de chaque réponse RSS")
+    args=ap.parse_args()
+    pairs=[(f"Société {i}", f"T{i:03d}") for i in range(args.rows)]
+
+    with local_feed(args.latency) as srv:
+        t0=time.perf_counter(); out=lib.news_summaries(pairs, deadline=60); secs=time.perf_counter()-t0
+        serial=args.rows*args.latency
+        assert len(srv.queries)==args.rows and all(items for _,_,items in out)
+        assert srv.peak>1 and secs<serial/2, f"{secs:.2f} s pour {serial:.2f} s en série"
+        print(f"concurrence : {args.rows} flux en {secs*1e3:.0f} ms (série ≈ {serial*1e3:.0f} ms), jusqu’à {srv.peak} en vol")
+
+    vides={i for i in range(0, args.rows, 3)}
+    pairs_v=[(f"VIDE {n}" if i in vides else n, t) for i,(n,t) in enumerate(pairs)]
+    with local_feed(args.latency) as srv:
+        out=lib.news_summaries(pairs_v, deadline=60)
+        fallback=[q for q in srv.queries if " T" not in q]
+        assert sorted(fallback)==sorted(pairs_v[i][0] for i in vides), "repli inattendu"
+        assert len(srv.queries)==args.rows+len(vides)
+        assert all(out[i][2] for i in range(args.rows)), "le repli devrait fournir des titres"
+        print(f"repli : {len(fallback)} requêtes « nom seul », uniquement pour les {len(vides)} réponses vides")
+
+    lents={i for i in range(1, args.rows, 4)}
+    pairs_l=[(f"LENT {n}" if i in lents else n, t) for i,(n,t) in enumerate(pairs)]
+    with local_feed(args.latency) as srv:
+        deadline=2.0  # les lents occupent des workers : les rapides passent en ~3 vagues sur les autres
+        t0=time.perf_counter(); out=lib.news_summaries(pairs_l, deadline=deadline); secs=time.perf_counter()-t0
+        assert secs<deadline+0.5, f"délai dépassé : {secs:.2f} s"
+        assert all(not out[i][2] and out[i][0]==lib.NO_NEWS_TXT for i in lents)
+        assert all(out[i][2] for i in range(args.rows) if i not in lents)
+        print(f"délai global {deadline:.1f} s : rendu en {secs*1e3:.0f} ms, "
+              f"{args.rows-len(lents)} lignes servies, {len(lents)} lentes → « {lib.NO_NEWS_TXT} »")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Délai avant premier contenu de la page Marché Global : rendu bloquant (market_snapshot puis
+news_summaries, comme avant) vs. market_pipeline (étapes livrées au fil de l’eau), sur le marché
+synthétique avec un indice lent (S&P 500 / Dow Jones) et des flux RSS lents.
+
+    python benchmarks/bench_pipeline.py [--tickers 650] [--latency 0.05] [--slow 2.0]
+                                        [--news-latency 0.3] [--index-budget 30]
+"""
+import os, sys, time, argparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0]=[os.path.dirname(HERE), HERE]
+import lib
+from fakes import FakeMarket, offline
+
+DAYS = 60
+VALUE_COL = "pct_1d"
+
+
+def slow_market(args) -> FakeMarket:
+    """Les tickers de l’indice lent (préfixe « S ») répondent avec `--slow` s de retard."""
+    market=FakeMarket(args.tickers, latency=args.latency, news_latency=args.news_latency)
+    download=market.download
+    def slow(tickers, **kw):
+        if any(str(t).startswith("S") for t in tickers): time.sleep(args.slow)
+        return download(tickers, **kw)
+    market.download=slow
+    return market
+
+
+def blocking():
+    t0=time.monotonic()
+    snap=lib.market_snapshot(DAYS)
+    first=time.monotonic()-t0
+    top, low = snap["movers"][VALUE_COL]
+    lib.news_summaries(lib.news_pairs(top)+lib.news_pairs(low))
+    return {"premier contenu": first, "movers": first, "première actu": time.monotonic()-t0,
+            "complet": time.monotonic()-t0, "hors délai": []}
+
+
+def progressive(budgets):
+    out={}
+    for ev in lib.market_pipeline(DAYS, VALUE_COL, budgets=budgets):
+        out.setdefault("premier contenu", ev.elapsed)
+        if ev.stage=="movers": out["movers"]=ev.elapsed
+        if ev.stage=="news": out.setdefault("première actu", ev.elapsed)
+        if ev.stage=="done": out["complet"]=ev.elapsed; out["hors délai"]=ev.value["late"]
+    return out
+
+
+def main():
+    ap=argparse.ArgumentParser()
+    ap.add_argument("--tickers", type=int, default=650)
+    ap.add_argument("--latency", type=float, default=0.05, help="latence (s) par appel yf.download")
+    ap.add_argument("--slow", type=float, default=2.0, help="retard (s) de l’indice lent")
+    ap.add_argument("--news-latency", type=float, default=0.3, help="latence (s) par requête RSS")
+    ap.add_argument("--index-budget", type=float, default=lib.PIPELINE_BUDGETS["index"])
+    args=ap.parse_args()
+    budgets={"index": args.index_budget}
+    for state in ("froid", "chaud"):
+        for name,run in (("bloquant", blocking), ("progressif", lambda: progressive(budgets))):
+            with offline(slow_market(args)) as data_dir:
+                if state=="chaud":
+                    lib.refresh_snapshots([DAYS])
+                    lib.invalidate("news")
+                res=run()
+            late=f" · hors délai : {', '.join(res['hors délai'])}" if res["hors délai"] else ""
+            print(f"{state:>5} {name:<10}: premier contenu {res['premier contenu']*1e3:6.0f} ms · "
+                  f"top/low {res['movers']*1e3:6.0f} ms · première actu {res['première actu']*1e3:6.0f} ms · "
+                  f"complet {res['complet']*1e3:6.0f} ms{late}")
+
+
+if __name__ == "__main__":
+    main()
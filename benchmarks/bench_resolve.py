@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Résolution d’identifiants (resolve_identifiers / resolve_identifier) et cache négatif :
+- un identifiant invalide saisi seul (recherche, ajout de ligne) est mis en cache négatif ;
+- un lot majoritairement invalide n’est plus re-sondé au rerun (aucun appel yf.download) ;
+- pendant une panne (exception du téléchargeur) rien n’est mis en cache négatif, et les
+  identifiants se résolvent au retour du réseau.
+
+    python benchmarks/bench_resolve.py [--ids 200]
+"""
+import os, sys, time, argparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0]=[os.path.dirname(HERE), HERE]
+import lib
+from fakes import FakeMarket, offline
+
+
+def main():
+    ap=argparse.ArgumentParser()
+    ap.add_argument("--ids", type=int, default=200)
+    args=ap.parse_args()
+    market=FakeMarket(650)
+    valid=[t for t,_ in market.members["CAC 40"] if lib.guess_yahoo_from_ls(t)==t+".PA"]  # deviné .PA
+    ids=[valid[i%len(valid)] if i%20==0 else f"ZQ{i:03d}" for i in range(args.ids)]
+    bad=sum(x.startswith("ZQ") for x in ids)
+
+    with offline(market):
+        ticker,_=lib.resolve_identifier("ZQ999")
+        n=len(market.calls)
+        assert ticker is None and lib._NEGATIVE_IDS.get(), "identifiant seul invalide non mis en cache négatif"
+        assert lib.resolve_identifier("ZQ999")[0] is None and len(market.calls)==n, "identifiant seul re-sondé"
+        print(f"identifiant seul : cache négatif {sorted(lib._NEGATIVE_IDS.get())}, rerun sans appel")
+
+        t0=time.perf_counter(); out=lib.resolve_identifiers(ids); cold=time.perf_counter()-t0
+        n=len(market.calls)
+        assert sum(t is None for t,_ in out)==bad and len(lib._NEGATIVE_IDS.get())>=bad
+        t0=time.perf_counter(); lib.resolve_identifiers(ids); warm=time.perf_counter()-t0
+        assert len(market.calls)==n, f"{len(market.calls)-n} appels au rerun"
+        print(f"{len(ids)} identifiants ({bad} invalides) : {cold*1e3:.0f} ms, rerun {warm*1e3:.1f} ms sans appel")
+
+    with offline(market):
+        yf=sys.modules["yfinance"]
+        def down(tickers, **kw): raise ConnectionError("panne simulée")
+        yf.download=down
+        try: out=lib.resolve_identifiers(["ZQ998", valid[1]])
+        finally: yf.download=market.download
+        assert all(t is None for t,_ in out) and not lib._NEGATIVE_IDS.get(), "panne mise en cache négatif"
+        assert lib.resolve_identifier(valid[1])[0] is not None, "non résolu après la panne"
+        print("panne : aucun cache négatif, résolution au retour du réseau")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Latence de la recherche instantanée (SearchIndex) sur l’univers synthétique des cinq
+indices + quelques alias ISIN/WKN/LS : construction de l’index puis pire requête
+(préfixes courts, noms, alias, fautes de frappe).
+
+    python benchmarks/bench_search.py [--tickers 650 5000] [--repeat 50]
+"""
+import os, sys, time, argparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0]=[os.path.dirname(HERE), HERE]
+import lib
+from fakes import FakeMarket, offline
+
+QUERIES = ["a", "S", "da", "cab", "société", "societe cac 1", "US03", "8659", "totb", "tte",
+           "sciete nas 12", "soc dax 12", "CABC.PA", "zzzz"]
+ALIASES = {"US0378331005": "AAPL", "865985": "AAPL", "TOTB": "TTE.PA"}
+
+
+def main():
+    ap=argparse.ArgumentParser()
+    ap.add_argument("--tickers", type=int, nargs="+", default=[650, 5000])
+    ap.add_argument("--repeat", type=int, default=50)
+    args=ap.parse_args()
+    for n in args.tickers:
+        with offline(FakeMarket(n)):
+            for k,t in ALIASES.items(): lib.set_mapping(k, t)
+            for name in lib.INDEX_SOURCES: lib.members(name)
+            t0=time.perf_counter(); idx=lib.search_index(); build=time.perf_counter()-t0
+            lat={}
+            for q in QUERIES:
+                t0=time.perf_counter()
+                for _ in range(args.repeat): idx.search(q)
+                lat[q]=(time.perf_counter()-t0)/args.repeat
+            worst=max(lat, key=lat.get)
+            print(f"{len(idx):>6} entrées : construction {build*1e3:6.1f} ms · médiane "
+                  f"{sorted(lat.values())[len(lat)//2]*1e3:5.2f} ms · pire {lat[worst]*1e3:5.2f} ms ({worst!r})")
+
+
+if __name__ == "__main__":
+    main()
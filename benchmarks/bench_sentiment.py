@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmark du scoring de titres : score_titles (lot + regex + mémo) vs. boucle d’origine.
+
+    python benchmarks/bench_sentiment.py [--titles 10000] [--unique 0.4]
+"""
+import os, sys, time, argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import lib
+
+WORDS = ["Airbus","TotalEnergies","LVMH","Apple","Nvidia","annonce","trimestre","hausse","baisse","marché",
+         "analystes","objectif","prix","action","Bourse","semaine","ventes","Chine","Europe","usine"]
+
+
+def synthetic_titles(n: int, unique_ratio: float, seed: int = 0) -> list:
+    """Titres pseudo-aléatoires avec doublons (un titre remonte pour plusieurs tickers)."""
+    rng=np.random.default_rng(seed)
+    kw=lib.NEWS_POS+lib.NEWS_NEG+[""]*20
+    pool=[" ".join(rng.choice(WORDS, 8))+" "+rng.choice(kw) for _ in range(max(1, int(n*unique_ratio)))]
+    return [pool[i] for i in rng.integers(0, len(pool), n)]
+
+
+def score_titles_legacy(titles) -> list:
+    POS=["résultats","bénéfice","contrat","relève","guidance","record","upgrade","partenariat","dividende","approbation"]
+    NEG=["profit warning","retard","procès","amende","downgrade","abaisse","enquête","rappel","départ","incident"]
+    sia=lib.get_sia()
+    scores=[]
+    for t in titles:
+        s=0.0
+        if sia:
+            try: s=sia.polarity_scores(t.lower())["compound"]
+            except Exception: s=0.0
+        tl=t.lower()
+        if any(k in tl for k in POS): s+=0.2
+        if any(k in tl for k in NEG): s-=0.2
+        scores.append(s)
+    return scores
+
+
+def main():
+    ap=argparse.ArgumentParser()
+    ap.add_argument("--titles", type=int, default=10000)
+    ap.add_argument("--unique", type=float, default=0.4)
+    args=ap.parse_args()
+    titles=synthetic_titles(args.titles, args.unique)
+    lib.get_sia()  # chargement du lexique hors chronométrage
+    t0=time.perf_counter(); old=score_titles_legacy(titles); t_old=time.perf_counter()-t0
+    lib._SCORE_MEMO.clear()
+    t0=time.perf_counter(); new=lib.score_titles(titles); t_cold=time.perf_counter()-t0
+    t0=time.perf_counter(); lib.score_titles(titles); t_warm=time.perf_counter()-t0
+    assert np.allclose(old, new)
+    print(f"{args.titles} titres ({len(set(titles))} uniques, VADER {'actif' if lib.get_sia() else 'absent'}) : "
+          f"boucle {t_old*1e3:.1f} ms · lot {t_cold*1e3:.1f} ms · lot mémorisé {t_warm*1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Cache de prix partagé entre process : N workers démarrent en même temps sur un stock vide
+et demandent le même panel (fetch_panel). Vérifie qu’un seul process télécharge (single-flight),
+que tous mappent la même version publiée (mmap, sans copie), puis qu’une seconde vague de
+workers ne télécharge plus rien.
+
+    python benchmarks/bench_shared_cache.py [--workers 6] [--tickers 650] [--days 120] [--latency 0.2]
+"""
+import os, sys, json, time, shutil, argparse, resource, subprocess, tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0]=[os.path.dirname(HERE), HERE]
+
+
+def worker(data_dir: str, n: int, days: int, latency: float, start_at: float, log: str):
+    import numpy as np
+    import lib
+    from fakes import FakeMarket, offline
+    market=FakeMarket(n, latency=latency)
+    download=market.download
+    def logged(tickers, **kw):
+        with open(log, "a") as f: f.write(f"{os.getpid()} {len(tickers)}\n")
+        return download(tickers, **kw)
+    market.download=logged
+    with offline(market, data_dir=data_dir):
+        _, union = lib._plan_market_fetch(lib.ALL_MARKETS)
+        time.sleep(max(0.0, start_at-time.time()))  # départ simultané
+        t0=time.perf_counter()
+        panel=lib.fetch_panel(union, days=days)
+        secs=time.perf_counter()-t0
+        met=lib.compute_metrics(panel)
+        close=panel.arrays["Close"]
+        print(json.dumps({"secs": secs, "mapped": isinstance(close, np.memmap),
+                          "version": os.path.basename(os.path.dirname(getattr(close, "filename", "") or "")),
+                          "checksum": float(np.nansum(met["MA20"])), "tickers": len(met),
+                          "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024}))
+
+
+def wave(k, data_dir, args, log):
+    start_at=time.time()+3.0  # laisse le temps aux imports
+    procs=[subprocess.Popen([sys.executable, __file__, "--worker", data_dir, str(args.tickers), str(args.days),
+                             str(args.latency), str(start_at), log], stdout=subprocess.PIPE, text=True)
+           for _ in range(k)]
+    out=[json.loads(p.communicate()[0]) for p in procs]
+    with open(log) as f: calls=[l.split() for l in f if l.strip()]
+    open(log, "w").close()
+    return out, calls
+
+
+def main():
+    ap=argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=6)
+    ap.add_argument("--tickers", type=int, default=650)
+    ap.add_argument("--days", type=int, default=120)
+    ap.add_argument("--latency", type=float, default=0.2, help="latence simulée (s) par appel yf.download")
+    ap.add_argument("--worker", nargs=6, help=argparse.SUPPRESS)
+    args=ap.parse_args()
+    if args.worker:
+        d, n, days, lat, start_at, log = args.worker
+        worker(d, int(n), int(days), float(lat), float(start_at), log); return
+    data_dir=tempfile.mkdtemp(prefix="dash-shared-"); log=os.path.join(data_dir, "downloads.log")
+    open(log, "w").close()
+    try:
+        for name in ("froid", "chaud"):
+            out, calls = wave(args.workers, data_dir, args, log)
+            pids={c[0] for c in calls}
+            versions={o["version"] for o in out}; sums={round(o["checksum"], 6) for o in out}
+            secs=sorted(o["secs"] for o in out)
+            print(f"{name:>5} : {args.workers} workers · {len(calls)} appels yf.download par {len(pids)} process · "
+                  f"version(s) {sorted(versions)} · mmap {all(o['mapped'] for o in out)} · "
+                  f"latence médiane {secs[len(secs)//2]*1e3:.0f} ms, max {secs[-1]*1e3:.0f} ms · "
+                  f"RSS max {max(o['rss_mb'] for o in out):.0f} Mo")
+            assert len(pids)<=1 and len(versions)==1 and len(sums)==1, "cache partagé incohérent"
+            if name=="chaud": assert not calls, "la seconde vague ne doit rien télécharger"
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""Suite de benchmarks hors-ligne de `lib` sur un marché synthétique (voir fakes.py) :
+compute_metrics, fetch_all_markets, news_summary, resolve_identifier et les tables des pages,
+à plusieurs échelles (tickers × barres). Rapporte le meilleur temps, le débit et le pic mémoire
+(tracemalloc, passe séparée pour ne pas fausser les temps), et compare à une référence JSON.
+
+    python benchmarks/bench_suite.py [--tickers 50 650 5000] [--bars 60 2500] [--cases metrics news]
+                                     [--save benchmarks/baseline.json] [--compare benchmarks/baseline.json]
+
+Avec --compare, le script sort en erreur si un cas est plus lent que la référence au-delà de --tolerance.
+"""
+import os, sys, json, math, time, shutil, argparse, platform, tracemalloc
+import numpy as np, pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import lib
+from fakes import FakeMarket, offline, reset_state
+
+PROFILE = "Neutre"
+SAMPLE = 200   # appels unitaires (news_summary, resolve_identifier) par mesure
+
+
+def days_for(bars: int) -> int:
+    """Jours calendaires couvrant `bars` séances."""
+    return math.ceil(bars*7/5)+1
+
+
+# Pages : mêmes appels de lib que pages/1_Marche_Global.py et pages/2_Par_Indice.py
+def page_global(days, value_col="pct_1d"):
+    tables={}
+    for ev in lib.market_pipeline(days, value_col, budgets={"news": 600}):
+        if ev.stage=="movers":
+            top, low = ev.value
+            tables={"top": lib.ai_table(top, value_col, PROFILE), "low": lib.ai_table(low, value_col, PROFILE)}
+        elif ev.stage=="news":
+            side, i = ev.key
+            lib.set_ai_news(tables[side], i, ev.value)
+    return tables
+
+
+def page_index(index_name="S&P 500", value_col="pct_1d"):
+    mem=lib.members(index_name)
+    met=lib.compute_metrics(lib.fetch_panel(mem["ticker"].tolist(), days=120)).merge(mem, left_on="Ticker", right_on="ticker", how="left")
+    return [lib.ai_table(df, value_col, PROFILE, news=lib.news_summaries(lib.news_pairs(df), deadline=600), price=True, summary=False)
+            for df in (lib.top_k(met, value_col, 5), lib.top_k(met, value_col, 5, ascending=True))]
+
+
+def identifiers(market: FakeMarket, n: int) -> list:
+    """Codes bruts (sans suffixe) tels que saisis dans la recherche : valides, mal devinés ou inconnus."""
+    raw=[t for mem in market.members.values() for t,_ in mem]
+    out=[raw[(i*7919)%len(raw)] for i in range(n)]
+    return [f"ZQ{i%97:02d}" if i%10==9 else t for i,t in enumerate(out)]
+
+
+# Cas : (nom, préparation non chronométrée, mesure, nombre d’éléments traités)
+def cases(market: FakeMarket, bars: int):
+    days=days_for(bars)
+    pairs=[(n, t) for mem in market.members.values() for t,n in mem][:SAMPLE]
+    ids=identifiers(market, SAMPLE)
+    state={}
+    def warm_prices(): lib.fetch_all_markets(lib.ALL_MARKETS, days_hist=days)
+    def metrics_input():
+        if "px" not in state:
+            warm_prices(); state["px"]=lib.fetch_prices(sorted(market.yahoo), days=days)
+    def invalidate_all():
+        reset_state()
+        for p in (lib.PRICES_DIR, lib.CONSTITUENTS_DIR, lib.SNAPSHOT_DIR, lib.SHARED_PANEL_DIR):
+            shutil.rmtree(p, ignore_errors=True)
+        for p in (lib.NEWS_CACHE_PATH, lib.MAPPING_PATH, lib.NEGATIVE_ID_PATH):
+            for q in (p, p+"-wal", p+"-shm"):
+                if os.path.exists(q): os.remove(q)
+        lib._NEWS_DB_READY=None
+    def news_warm():
+        for n,t in pairs: lib.news_summary(n, t)
+    def resolve_warm():
+        for x in ids: lib.resolve_identifier(x)
+    return [
+        ("metrics", metrics_input, lambda: lib.compute_metrics(state["px"]), market.size),
+        ("fetch_all_markets.cold", invalidate_all, lambda: lib.fetch_all_markets(lib.ALL_MARKETS, days_hist=days), market.size),
+        ("fetch_all_markets.store", lambda: (warm_prices(), reset_state()),
+         lambda: lib.fetch_all_markets(lib.ALL_MARKETS, days_hist=days), market.size),
+        ("fetch_all_markets.warm", warm_prices, lambda: lib.fetch_all_markets(lib.ALL_MARKETS, days_hist=days), market.size),
+        ("news_summary.cold", invalidate_all, news_warm, len(pairs)),
+        ("news_summary.warm", news_warm, news_warm, len(pairs)),
+        ("resolve_identifier.cold", invalidate_all, resolve_warm, len(ids)),
+        ("resolve_identifier.warm", resolve_warm, resolve_warm, len(ids)),
+        ("page.global", invalidate_all, lambda: page_global(days), market.size),
+        ("page.index", lambda: (warm_prices(), news_warm()), page_index, len(market.members["S&P 500"])),
+    ]
+
+
+def measure(setup, run, repeat: int):
+    best=float("inf")
+    for _ in range(repeat):
+        setup(); t0=time.perf_counter(); run(); best=min(best, time.perf_counter()-t0)
+    setup(); tracemalloc.start()
+    try: run(); peak=tracemalloc.get_traced_memory()[1]
+    finally: tracemalloc.stop()
+    return best, peak
+
+
+def run_suite(tickers, bars_list, only=None, repeat=3, max_cells=2_000_000, latency=0.0):
+    results={}
+    for n in tickers:
+        for bars in bars_list:
+            if n*bars>max_cells:
+                print(f"{n:>5} × {bars:<5} ignoré (> --max-cells {max_cells:,})"); continue
+            market=FakeMarket(n, latency=latency)
+            with offline(market):
+                for name,setup,run,items in cases(market, bars):
+                    if only and not any(name.startswith(o) for o in only): continue
+                    secs, peak = measure(setup, run, repeat)
+                    key=f"{name}@{n}x{bars}"
+                    results[key]={"ms":secs*1e3, "per_s":items/secs if secs else float("inf"),
+                                  "items":items, "peak_mb":peak/2**20}
+                    r=results[key]
+                    print(f"{name:<26} {n:>5} × {bars:<5} {r['ms']:10.1f} ms {r['per_s']:12,.0f} /s {r['peak_mb']:9.1f} Mo")
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Cas plus lents que la référence de plus de `tolerance` (0.25 = +25 %)."""
+    slower=[]
+    print(f"\n{'cas':<40} {'réf. ms':>10} {'ms':>10} {'ratio':>7}")
+    for key,r in results.items():
+        b=baseline.get("results", {}).get(key)
+        if not b: continue
+        ratio=r["ms"]/b["ms"] if b["ms"] else float("inf")
+        flag=" ⚠" if ratio>1+tolerance else ""
+        if flag: slower.append(key)
+        print(f"{key:<40} {b['ms']:10.1f} {r['ms']:10.1f} {ratio:7.2f}{flag}")
+    return slower
+
+
+def main():
+    ap=argparse.ArgumentParser()
+    ap.add_argument("--tickers", type=int, nargs="+", default=[50, 650, 5000])
+    ap.add_argument("--bars", type=int, nargs="+", default=[60, 2500])
+    ap.add_argument("--cases", nargs="+", help="préfixes de cas à exécuter (ex. metrics news_summary)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--max-cells", type=int, default=2_000_000, help="ignore les échelles tickers × barres au-delà")
+    ap.add_argument("--latency", type=float, default=0.0, help="latence simulée (s) par appel yf.download")
+    ap.add_argument("--save", help="écrit les résultats comme référence JSON")
+    ap.add_argument("--compare", help="compare à une référence JSON")
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    args=ap.parse_args()
+    results=run_suite(args.tickers, args.bars, args.cases, args.repeat, args.max_cells, args.latency)
+    if args.save:
+        meta={"created": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+              "numpy": np.__version__, "pandas": pd.__version__, "machine": platform.machine()}
+        lib._atomic_write_json(args.save, {"meta": meta, "results": results}, indent=2)
+        print(f"\nRéférence écrite : {args.save}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f: baseline=json.load(f)
+        slower=compare(results, baseline, args.tolerance)
+        if slower: sys.exit(f"\n{len(slower)} cas plus lents que la référence (> +{args.tolerance:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""Doublures hors-ligne et déterministes des services externes de `lib` :
+`yf.download` (Yahoo), les pages Wikipedia lues par `_read_tables` et le flux RSS Google News.
+
+    market=FakeMarket(650)
+    with offline(market) as data_dir:   # aucun accès réseau, data/ redirigé vers un dossier temporaire
+        lib.fetch_all_markets(lib.ALL_MARKETS, days_hist=90)
+
+Les prix sont une fonction fermée de (ticker, date) : un téléchargement complet puis un
+téléchargement incrémental (`start=`) renvoient les mêmes barres, comme le vrai service.
+"""
+import os, sys, time, types, shutil, tempfile, zlib, threading, contextlib
+import urllib.parse
+from xml.sax.saxutils import escape
+import numpy as np, pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import lib
+
+# poids relatifs des indices (le Dow Jones est un sous-ensemble du S&P 500, comme en vrai)
+INDEX_WEIGHTS = {"CAC 40": 40, "DAX 40": 40, "NASDAQ 100": 100, "S&P 500": 500}
+DOW_SHARE = 30/500
+FIELDS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+NEWS_WORDS = ["annonce","trimestre","hausse","baisse","marché","analystes","objectif","ventes","Europe","usine"]
+
+
+def _seed(s: str) -> int:
+    return zlib.crc32(s.encode("utf-8"))
+
+
+def _code(i: int, width=3) -> str:
+    out=""
+    for _ in range(width): i, r = divmod(i, 26); out=chr(65+r)+out
+    return out
+
+
+class FakeMarket:
+    """Univers synthétique d’environ `n_tickers` symboles uniques répartis sur INDEX_SOURCES."""
+    def __init__(self, n_tickers: int, latency: float = 0.0, news_latency: float = 0.0):
+        self.latency, self.news_latency = latency, news_latency
+        self.calls=[]; self.news_calls=[]; self.lock=threading.Lock()
+        total=sum(INDEX_WEIGHTS.values())
+        self.members={}
+        for k,(idx,w) in enumerate(INDEX_WEIGHTS.items()):
+            n=max(1, round(n_tickers*w/total))
+            self.members[idx]=[(f"{'CDNS'[k]}{_code(i)}", f"Société {idx[:3].strip()} {i}") for i in range(n)]
+        sp=self.members["S&P 500"]
+        self.members["Dow Jones"]=sp[:max(1, round(len(sp)*DOW_SHARE))]
+        suffix={idx: s for idx,(_,s) in lib.INDEX_SOURCES.items()}
+        self.yahoo={(t if not suffix[idx] else t+suffix[idx]) for idx,mem in self.members.items() for t,_ in mem}
+        self.urls={url: idx for idx,(url,_) in lib.INDEX_SOURCES.items()}
+
+    @property
+    def size(self) -> int: return len(self.yahoo)
+
+    # yfinance
+    def _dates(self, period=None, start=None):
+        end=pd.Timestamp.today().normalize()
+        first=pd.Timestamp(start) if start else end-pd.Timedelta(days=int(str(period).rstrip("d")))
+        return pd.bdate_range(first, end)
+
+    def bars(self, tickers, idx: pd.DatetimeIndex) -> np.ndarray:
+        """(barres, tickers, champs) : marche lisse + oscillation rapide, fonction de (ticker, date)."""
+        d=(idx.values.astype("datetime64[D]").astype(np.int64)-10000)[:, None].astype(float)
+        seeds=np.array([_seed(t) for t in tickers], dtype=np.int64)
+        base=20+seeds%480; f1=1/(40+seeds%60); f2=1/(3+seeds%5); ph=(seeds%628)/100
+        close=base*np.exp(0.25*np.sin(d*f1+ph)+0.03*np.sin(d*f2)+0.0001*d*((seeds%7)-3))
+        wig=0.01+0.01*np.abs(np.sin(d*f2*1.7))
+        out=np.empty(close.shape+(len(FIELDS),))
+        out[...,0]=close*(1-wig/2); out[...,1]=close*(1+wig); out[...,2]=close*(1-wig)
+        out[...,3]=close; out[...,4]=close; out[...,5]=1e5+seeds%100000
+        return out
+
+    def download(self, tickers, period=None, start=None, interval="1d", **kw) -> pd.DataFrame:
+        """Même forme que yf.download(..., group_by="ticker") : colonnes (ticker, champ),
+        NaN pour les symboles inconnus."""
+        if isinstance(tickers, str): tickers=tickers.split()
+        with self.lock: self.calls.append((len(tickers), period, start))
+        if self.latency: time.sleep(self.latency)
+        idx=self._dates(period, start); idx.name="Date"
+        a=self.bars(tickers, idx)
+        a[:, [t not in self.yahoo for t in tickers], :]=np.nan
+        cols=pd.MultiIndex.from_product([list(tickers), FIELDS])
+        return pd.DataFrame(a.reshape(len(idx), -1), index=idx, columns=cols)
+
+    # Wikipedia
+    def wikipedia_html(self, url: str) -> str:
+        idx=self.urls[url]
+        rows="".join(f"<tr><td>{escape(n)}</td><td>{t}</td><td>Industrie</td></tr>" for t,n in self.members[idx])
+        return ("<html><body><table><tr><th>Fondé</th><th>Siège</th></tr><tr><td>1987</td><td>—</td></tr></table>"
+                f"<table><tr><th>Company</th><th>Ticker</th><th>Sector</th></tr>{rows}</table></body></html>")
+
+    # Google News
+    def rss(self, query: str) -> str:
+        """0 à 5 titres selon la requête : ~1/6 des requêtes « nom ticker » sont vides (repli sur le nom)."""
+        s=_seed(query); n=s%6
+        kw=lib.NEWS_POS+lib.NEWS_NEG+[""]*10
+        items="".join(f"<item><title>{escape(query)} {NEWS_WORDS[(s>>i)%len(NEWS_WORDS)]} {kw[(s>>(2*i))%len(kw)]}</title>"
+                      f"<link>https://news.example/{s}/{i}</link></item>" for i in range(n))
+        return f"<rss><channel>{items}</channel></rss>"
+
+    def get(self, url, headers=None, timeout=None, **kw):
+        if url in self.urls:
+            return _Response(200, self.wikipedia_html(url))
+        if url.startswith(lib.NEWS_RSS_URL):
+            q=urllib.parse.parse_qs(urllib.parse.urlparse(url).query)["q"][0]
+            with self.lock: self.news_calls.append(q)
+            if self.news_latency: time.sleep(self.news_latency)
+            etag=f'"{_seed(q):x}"'
+            if (headers or {}).get("If-None-Match")==etag:
+                return _Response(304, "", {"ETag": etag})
+            return _Response(200, self.rss(q), {"ETag": etag})
+        raise ConnectionError(f"accès réseau interdit en benchmark : {url}")
+
+
+class _Response:
+    def __init__(self, status_code, text, headers=None):
+        self.status_code, self.text, self.headers = status_code, text, headers or {}
+        self.content=text.encode("utf-8")
+    def raise_for_status(self):
+        if self.status_code>=400: raise RuntimeError(f"HTTP {self.status_code}")
+
+
+# chemins de lib redirigés vers le dossier temporaire
+_PATHS = {
+    "DATA_DIR": "", "MAPPING_PATH": "id_mapping.json", "NEGATIVE_ID_PATH": "id_negative.json",
+    "CONSTITUENTS_DIR": "constituents", "PRICES_DIR": "prices", "PRICES_META_PATH": "prices/_meta.json",
+    "PRICES_CLAIMS_PATH": "prices/_claims.json", "NEWS_CACHE_PATH": "news_cache.sqlite", "SNAPSHOT_DIR": "snapshots",
+    "PORTFOLIO_DB_PATH": "portfolio.sqlite", "SHARED_PANEL_DIR": "panels",
+}
+
+
+def reset_state():
+    """Vide les caches mémoire de lib sans déclencher les hooks disque (≈ nouveau processus)."""
+    with lib._CACHE_LOCK:
+        for ns in lib._CACHES.values(): ns.entries.clear(); ns.bytes=0
+    lib._SNAPSHOT_MEMO.clear(); lib._SCORE_MEMO.clear()
+
+
+@contextlib.contextmanager
+def offline(market: FakeMarket, data_dir=None):
+    """Installe les doublures (modules `yfinance` et `requests`), redirige data/, coupe
+    la limite de débit et le rafraîchisseur d’instantanés ; tout est restauré à la sortie.
+    Renvoie le dossier de données."""
+    own=data_dir is None
+    data_dir=data_dir or tempfile.mkdtemp(prefix="dash-bench-")
+    saved_mods={m: sys.modules.get(m) for m in ("yfinance", "requests")}
+    saved={k: getattr(lib, k) for k in list(_PATHS)+["_MAPPING", "_NEGATIVE_IDS", "FETCH_RATE_LIMIT", "_NEWS_DB_READY",
+                                                     "SNAPSHOT_REFRESHER_ENABLED"]}
+    yf=types.ModuleType("yfinance"); yf.download=market.download
+    rq=types.ModuleType("requests"); rq.get=market.get
+    sys.modules["yfinance"], sys.modules["requests"] = yf, rq
+    for k,rel in _PATHS.items(): setattr(lib, k, os.path.join(data_dir, rel) if rel else data_dir)
+    lib._MAPPING=lib._JsonDictStore(lib.MAPPING_PATH); lib._NEGATIVE_IDS=lib._JsonDictStore(lib.NEGATIVE_ID_PATH)
+    lib.FETCH_RATE_LIMIT=0; lib._NEWS_DB_READY=None
+    lib.SNAPSHOT_REFRESHER_ENABLED=False  # un thread démon survivrait à la sortie et irait sur le vrai réseau
+    reset_state()
+    try:
+        yield data_dir
+    finally:
+        for m,mod in saved_mods.items():
+            if mod is None: sys.modules.pop(m, None)
+            else: sys.modules[m]=mod
+        for k,v in saved.items(): setattr(lib, k, v)
+        reset_state()
+        if own: shutil.rmtree(data_dir, ignore_errors=True)
@@ -1,29 +1,44 @@
 
 # -*- coding: utf-8 -*-
-import os, json, math
-import pandas as pd, numpy as np, requests, yfinance as yf
-from functools import lru_cache
-import nltk
-from nltk.sentiment import SentimentIntensityAnalyzer
+import os, re, sys, json, math, time, bisect, shutil, hashlib, threading, sqlite3, tempfile, contextlib, unicodedata
+import pandas as pd, numpy as np
+from io import StringIO
+from functools import wraps
+from collections import OrderedDict, deque, namedtuple
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+try: import fcntl  # verrous inter-process (absent sous Windows : pas de single-flight entre process)
+except ImportError: fcntl = None
+# yfinance, requests et nltk sont importés à la première utilisation (coût de démarrage des pages)
 
 DATA_DIR = "data"
 MAPPING_PATH = os.path.join(DATA_DIR, "id_mapping.json")
 UA = {"User-Agent":"Mozilla/5.0"}
 
-os.makedirs(DATA_DIR, exist_ok=True)
-if not os.path.exists(MAPPING_PATH):
-    with open(MAPPING_PATH,"w",encoding="utf-8") as f: json.dump({}, f)
-
-# VADER
-try:
-    nltk.data.find("sentiment/vader_lexicon.zip")
-except LookupError:
-    try: nltk.download("vader_lexicon")
-    except Exception: pass
-try:
-    SIA = SentimentIntensityAnalyzer()
-except Exception:
-    SIA = None
+# VADER : chargé au premier scoring, jamais à l’import (le téléchargement du lexique peut bloquer)
+_SIA = None
+_SIA_READY = False
+_SIA_LOCK = threading.Lock()
+
+def get_sia():
+    """Analyseur VADER partagé, ou None si nltk / le lexique sont indisponibles."""
+    global _SIA, _SIA_READY
+    if _SIA_READY: return _SIA
+    with _SIA_LOCK:
+        if _SIA_READY: return _SIA
+        try:
+            import nltk
+            from nltk.sentiment import SentimentIntensityAnalyzer
+            try:
+                nltk.data.find("sentiment/vader_lexicon.zip")
+            except LookupError:
+                try: nltk.download("vader_lexicon", quiet=True)
+                except Exception: pass
+            _SIA=SentimentIntensityAnalyzer()
+        except Exception:
+            _SIA=None
+        _SIA_READY=True
+    return _SIA
 
 PROFILE_PARAMS = {
     "Agressif": {"vol_max": 0.08, "target_mult": 1.10, "stop_mult": 0.92, "entry_mult": 0.99},
@@ -33,15 +48,273 @@ PROFILE_PARAMS = {
 def get_profile_params(profile: str) -> dict:
     return PROFILE_PARAMS.get(profile or "Neutre", PROFILE_PARAMS["Neutre"])
 
-def load_mapping() -> dict:
-    try:
-        with open(MAPPING_PATH,"r",encoding="utf-8") as f: return json.load(f)
-    except Exception: return {}
-def save_mapping(m: dict):
-    with open(MAPPING_PATH,"w",encoding="utf-8") as f: json.dump(m, f, ensure_ascii=False, indent=2)
+# Instrumentation : durées et volumes par étape (désactivé par défaut, coût quasi nul)
+PROFILING = os.environ.get("DASH_PROFILE", "0")=="1"
+TIMING_WINDOW = 512  # mesures conservées par étape pour les percentiles
+_TIMINGS = {}
+_TIMING_SEQ = [0]
+_TIMING_LOCK = threading.Lock()
+_PROFILING_BASE = PROFILING    # DASH_PROFILE ou set_profiling(on) sans propriétaire
+_PROFILING_OWNERS = set()      # sessions qui ont coché le profilage
+_TIMING_SCOPE = threading.local()  # repère du rerun en cours dans ce thread (voir timing_mark)
+
+def set_profiling(on: bool, owner=None):
+    """Active / coupe le profilage du process. Avec `owner` (id de session), il reste actif
+    tant qu’une session au moins le demande : décocher dans une session ne le coupe pas ailleurs."""
+    global PROFILING, _PROFILING_BASE
+    with _TIMING_LOCK:
+        if owner is None: _PROFILING_BASE=bool(on)
+        elif on: _PROFILING_OWNERS.add(owner)
+        else: _PROFILING_OWNERS.discard(owner)
+        PROFILING=_PROFILING_BASE or bool(_PROFILING_OWNERS)
+
+def _record_timing(stage: str, seconds: float, payload: dict):
+    scope=getattr(_TIMING_SCOPE, "mark", None)
+    with _TIMING_LOCK:
+        _TIMING_SEQ[0]+=1
+        rec={"seq":_TIMING_SEQ[0], "ts":time.time(), "stage":stage, "ms":seconds*1e3, "scope":scope, **payload}
+        q=_TIMINGS.get(stage)
+        if q is None: q=_TIMINGS[stage]=deque(maxlen=TIMING_WINDOW)
+        q.append(rec)
+
+class _NullSpan:
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+    def add(self, **payload): pass
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    def __init__(self, stage, payload): self.stage, self.payload = stage, payload
+    def __enter__(self): self.t0=time.perf_counter(); return self
+    def __exit__(self, exc_type, *exc):
+        if exc_type is not None: self.payload["error"]=exc_type.__name__
+        _record_timing(self.stage, time.perf_counter()-self.t0, self.payload)
+        return False
+    def add(self, **payload): self.payload.update(payload)
+
+def span(stage: str, **payload):
+    """`with span("étape", tickers=n) as sp: … sp.add(rows=m)` — mesuré seulement si PROFILING."""
+    return _Span(stage, payload) if PROFILING else _NULL_SPAN
+
+def timed(stage: str, payload=None):
+    """Décorateur : mesure chaque appel ; `payload(résultat, *args, **kw)` → volumes à enregistrer."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kw):
+            if not PROFILING: return fn(*args, **kw)
+            t0=time.perf_counter()
+            out=fn(*args, **kw)
+            extra={}
+            if payload:
+                try: extra=payload(out, *args, **kw)
+                except Exception: pass
+            _record_timing(stage, time.perf_counter()-t0, extra)
+            return out
+        return wrapper
+    return deco
+
+def timing_mark() -> int:
+    """Repère à prendre en début de rerun, pour timings_since(). Les mesures prises ensuite
+    par ce thread (et les workers qu’il lance via _in_scope) portent ce repère en `scope`."""
+    with _TIMING_LOCK: _TIMING_SEQ[0]+=1; mark=_TIMING_SEQ[0]  # unique même sans mesure entre deux repères
+    _TIMING_SCOPE.mark=mark
+    return mark
+
+def _in_scope(fn):
+    """`fn` exécuté dans un worker avec le repère de profilage du thread appelant."""
+    mark=getattr(_TIMING_SCOPE, "mark", None)
+    if mark is None: return fn
+    @wraps(fn)
+    def run(*args, **kw):
+        prev=getattr(_TIMING_SCOPE, "mark", None); _TIMING_SCOPE.mark=mark
+        try: return fn(*args, **kw)
+        finally: _TIMING_SCOPE.mark=prev
+    return run
+
+def timings_since(mark=0, scope=None) -> list:
+    """Mesures du process après `mark` ; avec `scope`, seulement celles du rerun qui a pris ce
+    repère (les reruns des autres sessions sont exclus)."""
+    with _TIMING_LOCK:
+        recs=[r for q in _TIMINGS.values() for r in q if r["seq"]>mark and (scope is None or r["scope"]==scope)]
+    return sorted(recs, key=lambda r: r["seq"])
+
+def timing_stats() -> pd.DataFrame:
+    """Compte et percentiles glissants (ms) par étape, plus les volumes cumulés."""
+    rows=[]
+    with _TIMING_LOCK:
+        items=[(s, list(q)) for s,q in _TIMINGS.items()]
+    for stage, recs in items:
+        ms=np.array([r["ms"] for r in recs])
+        row={"stage":stage, "count":len(recs), "p50_ms":np.percentile(ms, 50), "p90_ms":np.percentile(ms, 90),
+             "p99_ms":np.percentile(ms, 99), "total_ms":ms.sum()}
+        for k in ("tickers","rows","bytes","titles"):
+            vals=[r[k] for r in recs if isinstance(r.get(k), (int, float))]
+            if vals: row[k]=sum(vals)
+        rows.append(row)
+    return pd.DataFrame(rows).sort_values("total_ms", ascending=False) if rows else pd.DataFrame()
+
+def timings_jsonl(since=0) -> str:
+    return "".join(json.dumps(r, ensure_ascii=False, default=str)+"\n" for r in timings_since(since))
+
+def export_timings_jsonl(path: str, since=0) -> int:
+    """Ajoute les mesures (après le repère `since`) au fichier JSON lines ; renvoie le nombre écrit."""
+    recs=timings_since(since)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for r in recs: f.write(json.dumps(r, ensure_ascii=False, default=str)+"\n")
+    return len(recs)
+
+# Cache mémoire : espaces de noms avec TTL, borne en octets (LRU) et invalidation explicite
+class _CacheNamespace:
+    def __init__(self, name, ttl, max_bytes, on_invalidate=None):
+        self.name, self.ttl, self.max_bytes, self.on_invalidate = name, ttl, max_bytes, on_invalidate
+        self.entries=OrderedDict()  # key -> (value, expire_at, nbytes)
+        self.bytes=0; self.hits=0; self.misses=0; self.evictions=0
+    def _drop(self, key):
+        _, _, n = self.entries.pop(key); self.bytes-=n
+
+_CACHE_LOCK = threading.RLock()
+_CACHES = {}
+
+def cache_namespace(name: str, ttl: float, max_bytes: int, on_invalidate=None):
+    with _CACHE_LOCK:
+        ns=_CACHES.get(name)
+        if ns is None: ns=_CACHES[name]=_CacheNamespace(name, ttl, max_bytes, on_invalidate)
+        else: ns.ttl, ns.max_bytes, ns.on_invalidate = ttl, max_bytes, on_invalidate or ns.on_invalidate
+    return ns
+
+def _estimate_bytes(v) -> int:
+    if isinstance(v, pd.DataFrame) or isinstance(v, pd.Series): return int(v.memory_usage(index=True, deep=False).sum())
+    if isinstance(v, np.ndarray): return int(v.nbytes)
+    if isinstance(v, (list, tuple)): return sys.getsizeof(v)+sum(_estimate_bytes(x) for x in v)
+    if isinstance(v, dict): return sys.getsizeof(v)+sum(_estimate_bytes(x) for x in v.values())
+    return sys.getsizeof(v)
+
+def cache_get(namespace: str, key):
+    """(True, valeur) si présent et non expiré, sinon (False, None)."""
+    with _CACHE_LOCK:
+        ns=_CACHES[namespace]
+        e=ns.entries.get(key)
+        if e is not None and e[1]>time.monotonic():
+            ns.entries.move_to_end(key); ns.hits+=1
+            return True, e[0]
+        if e is not None: ns._drop(key)
+        ns.misses+=1
+        return False, None
+
+def cache_put(namespace: str, key, value, ttl=None):
+    """Mémorise `value` ; `ttl` remplace celui de l’espace pour cette entrée."""
+    n=_estimate_bytes(value)
+    with _CACHE_LOCK:
+        ns=_CACHES[namespace]
+        if key in ns.entries: ns._drop(key)
+        ns.entries[key]=(value, time.monotonic()+(ns.ttl if ttl is None else ttl), n); ns.bytes+=n
+        while ns.bytes>ns.max_bytes and len(ns.entries)>1:
+            ns._drop(next(iter(ns.entries))); ns.evictions+=1
+    return value
+
+def cached(namespace: str):
+    """Décorateur : mémorise le résultat dans l’espace `namespace` (clé = arguments)."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kw):
+            key=(fn.__name__, args, tuple(sorted(kw.items())))
+            hit, v = cache_get(namespace, key)
+            if hit: return v
+            return cache_put(namespace, key, fn(*args, **kw))
+        return wrapper
+    return deco
+
+def invalidate(namespace=None):
+    """Vide un espace (ou tous) et déclenche son hook (ex. forcer la revalidation disque).
+    Appelé par les boutons « 🔄 Rafraîchir » des pages."""
+    with _CACHE_LOCK:
+        names=list(_CACHES) if namespace is None else [namespace]
+        hooks=[]
+        for name in names:
+            ns=_CACHES.get(name)
+            if ns is None: continue
+            ns.entries.clear(); ns.bytes=0
+            if ns.on_invalidate: hooks.append(ns.on_invalidate)
+    for h in hooks:
+        try: h()
+        except Exception: pass
+
+def cache_stats() -> dict:
+    with _CACHE_LOCK:
+        return {n: {"entries":len(ns.entries), "bytes":ns.bytes, "max_bytes":ns.max_bytes, "ttl":ns.ttl,
+                    "hits":ns.hits, "misses":ns.misses, "evictions":ns.evictions} for n,ns in _CACHES.items()}
 
 def _norm(s:str) -> str: return (s or "").strip().upper()
 
+def _atomic_write(path: str, write):
+    """`write(tmp)` écrit dans un fichier temporaire du même dossier, puis renommage :
+    un lecteur concurrent voit toujours l’ancienne ou la nouvelle version complète."""
+    d=os.path.dirname(path) or "."
+    os.makedirs(d, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=d, prefix=".tmp-", suffix=os.path.splitext(path)[1])
+    os.close(fd)
+    try:
+        write(tmp); os.replace(tmp, path)
+    except BaseException:
+        try: os.remove(tmp)
+        except OSError: pass
+        raise
+
+def _atomic_write_json(path: str, obj, **kw):
+    def write(tmp):
+        with open(tmp,"w",encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False, **kw); f.flush(); os.fsync(f.fileno())
+    _atomic_write(path, write)
+
+@contextlib.contextmanager
+def _file_lock(path: str, blocking=True):
+    """Verrou exclusif inter-process (flock) sur `path` ; renvoie False si `blocking=False`
+    et qu’un autre process (ou thread) le détient déjà."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl is None: yield True; return
+        try: fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False; return
+        try: yield True
+        finally: fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class _JsonDictStore:
+    """Dict JSON sur disque gardé en mémoire : relu seulement si le fichier change
+    (mtime/taille), écrit atomiquement. Lookups O(1) sans re-parse."""
+    def __init__(self, path: str):
+        self.path=path; self.lock=threading.RLock(); self.data={}; self.stamp=None
+    def _stamp(self):
+        try: st=os.stat(self.path); return (st.st_mtime_ns, st.st_size)
+        except OSError: return None
+    def get(self, force=False) -> dict:
+        stamp=self._stamp()
+        if force or stamp!=self.stamp:
+            with self.lock:
+                try:
+                    with open(self.path,"r",encoding="utf-8") as f: data=json.load(f)
+                except Exception: data={}
+                self.data, self.stamp = (data if isinstance(data, dict) else {}), stamp
+        return self.data
+    def replace(self, data: dict):
+        with self.lock:
+            _atomic_write_json(self.path, data, indent=2)
+            self.data, self.stamp = data, self._stamp()
+    def update(self, items: dict):
+        if not items: return
+        # relu sous verrou fichier : plusieurs process Streamlit écrivent le même JSON
+        with self.lock, _file_lock(self.path+".lock"):
+            data=dict(self.get(force=True)); data.update(items)
+            self.replace(data)
+
+_MAPPING = _JsonDictStore(MAPPING_PATH)
+
+def load_mapping() -> dict: return dict(_MAPPING.get())
+def save_mapping(m: dict): _MAPPING.replace(dict(m))
+def lookup_mapping(key: str): return _MAPPING.get().get(_norm(key))
+def set_mapping(key: str, ticker: str): _MAPPING.update({_norm(key): ticker})
+
 def guess_yahoo_from_ls(ticker: str):
     """Essaye de deviner le suffixe Yahoo Finance à partir d’un ticker LS Exchange."""
     if not ticker:
@@ -72,30 +345,63 @@ def guess_yahoo_from_ls(ticker: str):
 
 def maybe_guess_yahoo(s: str):
     s=_norm(s)
-    m=load_mapping().get(s)
+    m=lookup_mapping(s)
     if m: return m
     return guess_yahoo_from_ls(s)
 
+NEGATIVE_ID_PATH = os.path.join(DATA_DIR, "id_negative.json")
+NEGATIVE_ID_TTL = 86400  # secondes avant de re-sonder un symbole Yahoo introuvable
+_NEGATIVE_IDS = _JsonDictStore(NEGATIVE_ID_PATH)
+
+def resolve_identifiers(ids):
+    """Résout une liste d’identifiants → [(ticker Yahoo | None, meta)] dans le même ordre.
+    Les alias connus sortent du mapping ; les suppositions heuristiques sont validées
+    par un seul téléchargement groupé, puis mapping et cache négatif sont écrits une fois."""
+    raws=[_norm(x) for x in ids]
+    out=[(None, {})]*len(raws)
+    now=time.time(); negative=_NEGATIVE_IDS.get()
+    guesses={}
+    for i,raw in enumerate(raws):
+        if not raw: continue
+        hit=lookup_mapping(raw)
+        if hit: out[i]=(hit, {"source":"mapping"}); continue
+        guess=guess_yahoo_from_ls(raw)
+        if not guess or now-negative.get(guess, 0)<NEGATIVE_ID_TTL: continue
+        guesses.setdefault(guess, []).append(i)
+    if not guesses: return out
+    unknown=[]
+    px=_download_chunked(list(guesses), period="5d", failed=unknown)
+    valid=set(px.loc[px["Close"].notna(), "Ticker"]) if not px.empty else set()
+    unknown=set(unknown)
+    found, failed = {}, {}
+    for guess, rows in guesses.items():
+        if guess in valid:
+            for i in rows: out[i]=(guess, {"source":"heuristic"}); found[raws[i]]=guess
+        elif guess not in unknown: failed[guess]=now  # invalide seulement si son appel a abouti
+    _MAPPING.update(found); _NEGATIVE_IDS.update(failed)
+    return out
+
 def resolve_identifier(id_or_ticker: str):
-    raw=_norm(id_or_ticker)
-    if not raw: return None, {}
-    mapping=load_mapping()
-    if raw in mapping: return mapping[raw], {"source":"mapping"}
-    guess=maybe_guess_yahoo(raw)
-    if guess:
-        try:
-            hist=yf.download(guess, period="5d", interval="1d", progress=False, threads=False)
-            if not hist.empty:
-                mapping[raw]=guess; save_mapping(mapping)
-                return guess, {"source":"heuristic"}
-        except Exception: pass
-    return None, {}
+    return resolve_identifiers([id_or_ticker])[0]
 
 # Constituents
-@lru_cache(maxsize=32)
+CONSTITUENTS_DIR = os.path.join(DATA_DIR, "constituents")
+CONSTITUENTS_TTL = 7*86400  # secondes entre deux scrapes Wikipedia d’un indice
+CONSTITUENTS_RETRY_TTL = 300  # secondes avant de retenter un scrape échoué (instantané périmé ou vide servi)
+INDEX_SOURCES = {
+    "CAC 40":     ("https://en.wikipedia.org/wiki/CAC_40", ".PA"),
+    "DAX 40":     ("https://en.wikipedia.org/wiki/DAX", ".DE"),
+    "NASDAQ 100": ("https://en.wikipedia.org/wiki/NASDAQ-100", None),
+    "S&P 500":    ("https://en.wikipedia.org/wiki/List_of_S%26P_500_companies", None),
+    "Dow Jones":  ("https://en.wikipedia.org/wiki/Dow_Jones_Industrial_Average", None),
+}
+MEMBER_COLS = ["ticker","name","index"]
+cache_namespace("constituents", ttl=CONSTITUENTS_TTL, max_bytes=16*2**20)
+
 def _read_tables(url: str):
+    import requests
     html=requests.get(url, headers=UA, timeout=20).text
-    return pd.read_html(html)
+    return pd.read_html(StringIO(html))  # pandas ≥ 3 n’accepte plus le HTML littéral
 
 def _extract_name_ticker(tables):
     table=None
@@ -111,46 +417,79 @@ def _extract_name_ticker(tables):
     out["ticker"]=out["ticker"].astype(str).str.strip()
     return out.dropna().drop_duplicates(subset=["ticker"])
 
-@lru_cache(maxsize=8)
-def members_cac40():
-    df=_extract_name_ticker(_read_tables("https://en.wikipedia.org/wiki/CAC_40"))
-    df["ticker"]=df["ticker"].apply(lambda x: x if "." in x else f"{x}.PA")
-    df["index"]="CAC 40"; return df
-@lru_cache(maxsize=8)
-def members_dax40():
-    df=_extract_name_ticker(_read_tables("https://en.wikipedia.org/wiki/DAX"))
-    df["ticker"]=df["ticker"].apply(lambda x: x if "." in x else f"{x}.DE")
-    df["index"]="DAX 40"; return df
-@lru_cache(maxsize=8)
-def members_nasdaq100():
-    df=_extract_name_ticker(_read_tables("https://en.wikipedia.org/wiki/NASDAQ-100"))
-    df["index"]="NASDAQ 100"; return df
-@lru_cache(maxsize=8)
-def members_sp500():
-    df=_extract_name_ticker(_read_tables("https://en.wikipedia.org/wiki/List_of_S%26P_500_companies"))
-    df["index"]="S&P 500"; return df
-@lru_cache(maxsize=8)
-def members_dowjones():
-    df=_extract_name_ticker(_read_tables("https://en.wikipedia.org/wiki/Dow_Jones_Industrial_Average"))
-    df["index"]="Dow Jones"; return df
+def _scrape_members(index_name: str) -> pd.DataFrame:
+    url, suffix = INDEX_SOURCES[index_name]
+    df=_extract_name_ticker(_read_tables(url))
+    if suffix: df["ticker"]=df["ticker"].apply(lambda x: x if "." in x else f"{x}{suffix}")
+    df["index"]=index_name
+    return df[MEMBER_COLS].reset_index(drop=True)
+
+def _constituents_path(index_name: str) -> str:
+    return os.path.join(CONSTITUENTS_DIR, re.sub(r"[^a-z0-9]+", "_", index_name.lower()).strip("_")+".csv")
+
+def _read_constituents(p: str) -> pd.DataFrame:
+    return pd.read_csv(p, dtype=str, keep_default_na=False)[MEMBER_COLS]
+
+def _members_snapshot(index_name: str):
+    """(constituants, durée de validité en s) depuis data/constituents/ ; re-scrape au-delà
+    de CONSTITUENTS_TTL, et en cas d’échec on sert le dernier instantané valide (ou une table
+    vide) pour CONSTITUENTS_RETRY_TTL seulement."""
+    p=_constituents_path(index_name)
+    def remaining():
+        try: return CONSTITUENTS_TTL-(time.time()-os.path.getmtime(p))
+        except OSError: return 0
+    if remaining()>0:
+        try: return _read_constituents(p), remaining()
+        except Exception: pass
+    with _file_lock(p+".lock"):  # un seul scrape quand plusieurs process ratent en même temps
+        if remaining()>0:
+            try: return _read_constituents(p), remaining()
+            except Exception: pass
+        try:
+            df=_scrape_members(index_name)
+            if not df.empty:
+                _atomic_write(p, lambda tmp: df.to_csv(tmp, index=False))
+                return df, CONSTITUENTS_TTL
+        except Exception: pass
+    if os.path.exists(p):
+        try: return _read_constituents(p), CONSTITUENTS_RETRY_TTL
+        except Exception: pass
+    return pd.DataFrame(columns=MEMBER_COLS), CONSTITUENTS_RETRY_TTL
+
+def members_cac40(): return members("CAC 40")
+def members_dax40(): return members("DAX 40")
+def members_nasdaq100(): return members("NASDAQ 100")
+def members_sp500(): return members("S&P 500")
+def members_dowjones(): return members("Dow Jones")
+@timed("members", lambda out, index_name: {"index": index_name, "tickers": len(out)})
 def members(index_name: str):
-    if index_name=="CAC 40": return members_cac40()
-    if index_name=="DAX 40": return members_dax40()
-    if index_name=="NASDAQ 100": return members_nasdaq100()
-    if index_name=="S&P 500": return members_sp500()
-    if index_name=="Dow Jones": return members_dowjones()
-    return pd.DataFrame(columns=["ticker","name","index"])
+    if index_name not in INDEX_SOURCES: return pd.DataFrame(columns=MEMBER_COLS)
+    key=("members", index_name)
+    hit, df = cache_get("constituents", key)
+    if hit: return df
+    df, ttl = _members_snapshot(index_name)
+    return cache_put("constituents", key, df, ttl=ttl)
 
 # Prices & indicators
-from functools import lru_cache as _lc
-@_lc(maxsize=64)
-def fetch_prices_cached(tickers_tuple: tuple, period="120d"):
-    tickers=list(tickers_tuple)
+PRICES_DIR = os.path.join(DATA_DIR, "prices")
+PRICES_META_PATH = os.path.join(PRICES_DIR, "_meta.json")
+PRICES_CLAIMS_PATH = os.path.join(PRICES_DIR, "_claims.json")
+PRICE_STORE_TTL = 3600  # secondes avant de redemander les dernières barres d’un ticker
+PRICE_CLAIM_TTL = 120   # secondes : une réservation plus ancienne (worker disparu) est reprise
+PRICE_CACHE_TTL = 900
+PRICE_CACHE_MAX_BYTES = 256*2**20
+
+@timed("yf.download", lambda out, tickers, **kw: {"tickers": len(tickers), "rows": len(out),
+                                                   "bytes": int(out.memory_usage(index=True).sum())})
+def _download_prices(tickers, **kw):
+    """Téléchargement Yahoo brut → format long (Date, OHLCV, Ticker). None si l’appel a
+    échoué (exception), DataFrame vide si Yahoo a répondu sans barres."""
     if not tickers: return pd.DataFrame()
     try:
-        data=yf.download(tickers, period=period, interval="1d", auto_adjust=False, group_by="ticker", threads=False, progress=False)
+        import yfinance as yf
+        data=yf.download(tickers, interval="1d", auto_adjust=False, group_by="ticker", threads=False, progress=False, **kw)
     except Exception:
-        return pd.DataFrame()
+        return None
     if data is None or len(data)==0: return pd.DataFrame()
     frames=[]
     if isinstance(data, pd.DataFrame) and {"Open","High","Low","Close"}.issubset(data.columns):
@@ -162,75 +501,791 @@ def fetch_prices_cached(tickers_tuple: tuple, period="120d"):
                     df=data[t].copy(); df["Ticker"]=t; frames.append(df)
             except Exception: continue
     if not frames: return pd.DataFrame()
-    out=pd.concat(frames); out.reset_index(inplace=True)
+    out=pd.concat(frames); out.index.name="Date"; out.reset_index(inplace=True)
+    out.columns.name=None
     return out
-def fetch_prices(tickers, days=120): return fetch_prices_cached(tuple(tickers), period=f"{days}d")
 
-def compute_metrics(df: pd.DataFrame) -> pd.DataFrame:
+FETCH_CHUNK_SIZE = 100   # tickers par appel yf.download
+FETCH_MAX_WORKERS = 4    # appels simultanés
+FETCH_RATE_LIMIT = 2.0   # appels yf.download par seconde (0 = illimité)
+
+class _RateLimiter:
+    """Espace les appels d’au moins 1/rate seconde, partagé entre threads."""
+    def __init__(self, rate: float):
+        self.interval=1.0/rate if rate else 0.0
+        self.lock=threading.Lock(); self.next=0.0
+    def wait(self):
+        if not self.interval: return
+        with self.lock:
+            now=time.monotonic(); at=max(now, self.next); self.next=at+self.interval
+        if at>now: time.sleep(at-now)
+
+def _download_chunked(tickers, downloader=None, chunk_size=None, max_workers=None, rate_limit=None, failed=None, **kw) -> pd.DataFrame:
+    """Télécharge chaque ticker une seule fois, par paquets bornés exécutés en parallèle.
+    `failed` (liste) reçoit les tickers des paquets dont l’appel a échoué (None renvoyé par
+    le téléchargeur) : leur absence ne dit rien de leur validité, contrairement à une réponse vide."""
+    downloader=downloader or _download_prices
+    tickers=list(dict.fromkeys(tickers))
+    if not tickers: return pd.DataFrame()
+    size=max(1, chunk_size or FETCH_CHUNK_SIZE)
+    chunks=[tickers[i:i+size] for i in range(0, len(tickers), size)]
+    limiter=_RateLimiter(FETCH_RATE_LIMIT if rate_limit is None else rate_limit)
+    def run(chunk):
+        limiter.wait()
+        out=downloader(chunk, **kw)
+        if out is None and failed is not None: failed.extend(chunk)
+        return out
+    if len(chunks)==1: frames=[run(chunks[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(len(chunks), max_workers or FETCH_MAX_WORKERS)) as ex:
+            frames=list(ex.map(_in_scope(run), chunks))
+    frames=[f for f in frames if f is not None and not f.empty]
+    if not frames: return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def _price_path(t: str) -> str:
+    return os.path.join(PRICES_DIR, t.replace("/","_").replace(os.sep,"_")+".parquet")
+
+def _load_price_meta() -> dict:
+    try:
+        with open(PRICES_META_PATH,"r",encoding="utf-8") as f: return json.load(f)
+    except Exception: return {}
+def _save_price_meta(meta: dict): _atomic_write_json(PRICES_META_PATH, meta)
+
+def _load_price_claims() -> dict:
+    try:
+        with open(PRICES_CLAIMS_PATH,"r",encoding="utf-8") as f: return json.load(f)
+    except Exception: return {}
+def _save_price_claims(claims: dict): _atomic_write_json(PRICES_CLAIMS_PATH, claims)
+
+def _load_stored_prices(t: str):
+    p=_price_path(t)
+    if not os.path.exists(p): return None
+    try: return pd.read_parquet(p)
+    except Exception: return None
+def _store_prices(t: str, df: pd.DataFrame):
+    _atomic_write(_price_path(t), lambda tmp: df.to_parquet(tmp, index=False))
+
+def _period_cutoff(dates: pd.Series, days: int):
+    cut=pd.Timestamp.today().normalize()-pd.Timedelta(days=days)
+    tz=getattr(dates.dt, "tz", None)
+    return cut.tz_localize(tz) if tz is not None else cut
+
+def _sync_price_store(tickers, days: int) -> dict:
+    """Met à jour le stock local : historique complet pour les tickers inconnus
+    (ou trop courts), sinon uniquement les barres depuis la dernière date stockée."""
+    # verrou inter-process court (planification puis écriture, jamais pendant le réseau) : les
+    # tickers à télécharger sont réservés dans _claims.json ; un autre worker (ou thread) attend
+    # ces tickers au lieu de les retélécharger, et des lots disjoints se chargent en parallèle
+    lock=os.path.join(PRICES_DIR, ".sync.lock")
+    todo=list(tickers); stored={}
+    while True:
+        with _file_lock(lock):
+            meta=_load_price_meta(); claims=_load_price_claims(); now=time.time()
+            full, delta, waiting = [], {}, []
+            for t in todo:
+                m=meta.get(t) or {}; s=stored[t]=_load_stored_prices(t)
+                stale=s is None or s.empty or m.get("days",0)<days
+                if not stale and now-m.get("checked",0)<=PRICE_STORE_TTL: continue
+                if claims.get(t,0)>now: waiting.append(t)
+                elif stale: full.append(t)
+                else: delta.setdefault(pd.Timestamp(s["Date"].max()).strftime("%Y-%m-%d"), []).append(t)
+            mine=full+[t for ts in delta.values() for t in ts]
+            if mine: _save_price_claims({**claims, **{t: now+PRICE_CLAIM_TTL for t in mine}})
+        if mine:
+            batches=[(full, {"period":f"{days}d"})]+[(ts, {"start":start}) for start,ts in delta.items()]
+            fetched={}
+            try:
+                for ts,kw in batches:
+                    if not ts: continue
+                    new=_download_chunked(ts, **kw)
+                    if new.empty: continue
+                    for t,fresh in new.dropna(subset=["Close"]).groupby("Ticker", sort=False): fetched[t]=fresh
+            finally:
+                with _file_lock(lock):
+                    meta=_load_price_meta(); now=time.time()
+                    for t,fresh in fetched.items():
+                        old=stored.get(t)
+                        df=fresh if old is None or old.empty else pd.concat([old, fresh], ignore_index=True)
+                        df=df.drop_duplicates(subset=["Date"], keep="last").sort_values("Date").reset_index(drop=True)
+                        _store_prices(t, df); stored[t]=df
+                        prev=meta.get(t) or {}
+                        meta[t]={"checked":now, "days":max(prev.get("days",0), days)}
+                    if fetched: _save_price_meta(meta)
+                    claims=_load_price_claims()
+                    _save_price_claims({t:v for t,v in claims.items() if t not in set(mine)})
+        if not waiting: return stored
+        todo=waiting
+        time.sleep(0.05)
+
+def _expire_price_store():
+    """Force la revalidation des dernières barres au prochain fetch_prices / fetch_panel."""
+    with _file_lock(os.path.join(PRICES_DIR, ".sync.lock")):
+        meta=_load_price_meta()
+        if meta: _save_price_meta({t:{**m, "checked":0} for t,m in meta.items()})
+    _expire_shared_panels()
+    with _LIVE_LOCK: _LIVE.clear()  # états intraday réamorcés depuis le stock au prochain appel
+cache_namespace("prices", ttl=PRICE_CACHE_TTL, max_bytes=PRICE_CACHE_MAX_BYTES, on_invalidate=_expire_price_store)
+
+def _cached_bars(tickers, days: int) -> dict:
+    """Barres par ticker depuis le cache mémoire (clé = ticker, servie si la période
+    couverte ≥ `days`) ; seuls les tickers absents passent par le stock disque / réseau."""
+    bars, missing = {}, []
+    for t in tickers:
+        hit, v = cache_get("prices", ("bars", t))
+        if hit and v[0]>=days: bars[t]=v[1]
+        else: missing.append(t)
+    if missing:
+        stored=_sync_price_store(missing, days)
+        for t in missing:
+            df=stored.get(t)
+            if df is not None and df.empty: df=None
+            cache_put("prices", ("bars", t), (days, df)); bars[t]=df
+    return bars
+
+def fetch_prices(tickers, days=120) -> pd.DataFrame:
+    """Format long (Date, OHLCV, Ticker) sur `days` jours calendaires. Clé canonique
+    (ensemble trié de tickers) : l’ordre ne compte pas, et une requête couverte par des
+    téléchargements antérieurs (plus de tickers ou période plus longue) est servie par découpage."""
+    tickers=list(dict.fromkeys(t for t in tickers if t))
+    if not tickers: return pd.DataFrame()
+    key=("panel", tuple(sorted(tickers)), int(days))
+    hit, out = cache_get("prices", key)
+    if hit: return out
+    frames=[]
+    for t,df in _cached_bars(tickers, int(days)).items():
+        if df is None: continue
+        df=df.iloc[df["Date"].searchsorted(_period_cutoff(df["Date"], days)):]
+        if not df.empty: frames.append(df)
+    out=pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return cache_put("prices", key, out)
+
+def price_history(tickers, min_days=90) -> pd.DataFrame:
+    """Tout l’historique stocké (format long) des tickers, au moins `min_days` jours."""
+    frames=[df for df in _cached_bars(list(dict.fromkeys(t for t in tickers if t)), int(min_days)).values() if df is not None]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+def fetch_prices_cached(tickers_tuple: tuple, period="120d"):
+    return fetch_prices(list(tickers_tuple), days=int(str(period).rstrip("d")))
+
+PANEL_FIELDS = ("Open","High","Low","Close","Volume")
+
+class PricePanel:
+    """Prix en tableaux float32 (dates × tickers) par champ, sur un index de dates partagé
+    et un axe de tickers codé en entiers (position dans `tickers`). NaN = pas de barre.
+    ~5× plus léger que le format long (Date/Ticker répétés, float64) ; les vues par champ
+    ou par ticker ne copient pas les tableaux. Précision : celle du float32 (~7 chiffres)."""
+    def __init__(self, dates, tickers, arrays: dict):
+        self.dates=pd.DatetimeIndex(dates, name="Date"); self.tickers=pd.Index(tickers, name="Ticker")
+        self.arrays=arrays
+
+    @classmethod
+    def from_columns(cls, codes, tickers, dates, columns: dict):
+        """codes (position du ticker par barre) + dates + colonnes → panel, une seule écriture par champ."""
+        dcodes, udates = pd.factorize(pd.DatetimeIndex(dates), sort=True)
+        shape=(len(udates), len(tickers))
+        arrays={}
+        for f in PANEL_FIELDS:
+            a=np.full(shape, np.nan, dtype=np.float32)
+            v=columns.get(f)
+            if v is not None: a[dcodes, codes]=v
+            arrays[f]=a
+        return cls(udates, tickers, arrays)
+
+    @classmethod
+    def from_long(cls, df: pd.DataFrame):
+        if df is None or df.empty: return cls([], [], {f: np.empty((0, 0), np.float32) for f in PANEL_FIELDS})
+        df=df[df["Ticker"].notna()]
+        codes, tickers = pd.factorize(df["Ticker"], sort=True)
+        return cls.from_columns(codes, tickers, df["Date"], {f: df[f].to_numpy() for f in PANEL_FIELDS if f in df.columns})
+
+    @property
+    def empty(self) -> bool: return self.arrays["Close"].size==0
+    @property
+    def shape(self): return self.arrays["Close"].shape
+    def __sizeof__(self) -> int: return sum(a.nbytes for a in self.arrays.values())+self.dates.nbytes+self.tickers.memory_usage()
+
+    def field(self, name: str) -> pd.DataFrame:
+        """Vue dates × tickers d’un champ (sans copie)."""
+        return pd.DataFrame(self.arrays[name], index=self.dates, columns=self.tickers, copy=False)
+
+    def ticker(self, t: str) -> pd.DataFrame:
+        """Barres d’un ticker (Date en index, OHLCV), lignes sans cours exclues."""
+        j=self.tickers.get_loc(t); ok=~np.isnan(self.arrays["Close"][:, j])
+        return pd.DataFrame({f: a[ok, j] for f,a in self.arrays.items()}, index=self.dates[ok])
+
+    def select(self, tickers) -> "PricePanel":
+        cols=self.tickers.get_indexer([t for t in dict.fromkeys(tickers) if t in self.tickers])
+        rows=np.flatnonzero((~np.isnan(self.arrays["Close"][:, cols])).any(axis=1))
+        return PricePanel(self.dates[rows], self.tickers[cols], {f: a[np.ix_(rows, cols)] for f,a in self.arrays.items()})
+
+    def to_long(self) -> pd.DataFrame:
+        """Format long (Date, OHLCV, Ticker) de fetch_prices, pour le code qui l’attend."""
+        r, c = np.nonzero(~np.isnan(self.arrays["Close"]))
+        out={"Date": self.dates[r]}
+        out.update({f: a[r, c].astype(float) for f,a in self.arrays.items()})
+        out["Ticker"]=self.tickers[c]
+        return pd.DataFrame(out)
+
+    def tail(self, depth: int):
+        """Les `depth` dernières barres de chaque ticker, alignées à droite (trous de
+        calendrier sautés) → (high, low, close) float64 (depth × tickers), index de la
+        dernière date, nombre de barres. Seules les dernières lignes sont parcourues."""
+        close=self.arrays["Close"]; n=len(close); w=min(n, 2*depth)
+        while True:
+            valid=~np.isnan(close[n-w:])
+            cnt=valid.sum(axis=0)
+            if w==n or (cnt>=depth).all(): break
+            w=min(n, 2*w)
+        rank=np.cumsum(valid[::-1], axis=0)[::-1]  # rang depuis la fin
+        r, c = np.nonzero(valid & (rank<=depth))
+        dst=depth-rank[r, c]
+        out=[]
+        for f in ("High","Low","Close"):
+            a=np.full((depth, close.shape[1]), np.nan); a[dst, c]=self.arrays[f][n-w+r, c]; out.append(a)
+        last=np.full(close.shape[1], -1); last[c[dst==depth-1]]=n-w+r[dst==depth-1]
+        return out[0], out[1], out[2], last, cnt
+
+def _build_panel(tickers, days: int) -> PricePanel:
+    bars=[]
+    for t,df in (_cached_bars(tickers, int(days)).items() if tickers else ()):
+        if df is None: continue
+        df=df.iloc[df["Date"].searchsorted(_period_cutoff(df["Date"], days)):]
+        if not df.empty: bars.append((t, df))
+    if not bars: return PricePanel.from_long(None)
+    bars.sort(key=lambda x: x[0])
+    dates=np.unique(np.concatenate([df["Date"].to_numpy() for _,df in bars]))
+    # écriture directe colonne par colonne dans les tableaux float32 : pas de concaténation float64
+    arrays={f: np.full((len(dates), len(bars)), np.nan, dtype=np.float32) for f in PANEL_FIELDS}
+    for j,(_,df) in enumerate(bars):
+        r=np.searchsorted(dates, df["Date"].to_numpy())
+        for f in PANEL_FIELDS:
+            if f in df.columns: arrays[f][r, j]=df[f].to_numpy()
+    return PricePanel(dates, [t for t,_ in bars], arrays)
+
+# Panels partagés entre process (plusieurs workers Streamlit) : une version par clé est écrite
+# en .npy dans data/panels/<clé>/v<ns>/ puis mappée en lecture seule (mmap) par tous les workers.
+# Un verrou fichier par clé garantit qu’un seul process télécharge et publie (single-flight).
+SHARED_PANEL_DIR = os.path.join(DATA_DIR, "panels")
+SHARED_PANEL_TTL = PRICE_CACHE_TTL
+SHARED_PANEL_KEEP = 2  # versions conservées par clé (les lecteurs de la précédente restent valides)
+
+def _shared_panel_dir(tickers, days: int) -> str:
+    h=hashlib.sha1(f"{int(days)}|{'|'.join(sorted(tickers))}".encode("utf-8")).hexdigest()[:20]
+    return os.path.join(SHARED_PANEL_DIR, h)
+
+def _load_shared_panel(d: str):
+    """(âge en s, PricePanel mappé) de la version courante, ou None."""
+    try:
+        with open(os.path.join(d, "CURRENT"), "r", encoding="utf-8") as f: ver=f.read().strip()
+        v=os.path.join(d, ver)
+        arrays={f: np.load(os.path.join(v, f+".npy"), mmap_mode="r") for f in PANEL_FIELDS}
+        dates=np.load(os.path.join(v, "dates.npy")); tickers=np.load(os.path.join(v, "tickers.npy"))
+    except (OSError, ValueError):
+        return None
+    return time.time()-int(ver[1:])/1e9, PricePanel(dates, tickers.tolist(), arrays)
+
+def _publish_shared_panel(d: str, panel: PricePanel):
+    ver=f"v{time.time_ns()}"
+    tmp=tempfile.mkdtemp(dir=d, prefix=".tmp-")
+    try:
+        for f,a in panel.arrays.items(): np.save(os.path.join(tmp, f+".npy"), a)
+        np.save(os.path.join(tmp, "dates.npy"), panel.dates.to_numpy("datetime64[ns]"))
+        np.save(os.path.join(tmp, "tickers.npy"), np.array(panel.tickers, dtype=str))
+        os.replace(tmp, os.path.join(d, ver))
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True); raise
+    def write(p):
+        with open(p, "w", encoding="utf-8") as f: f.write(ver)
+    _atomic_write(os.path.join(d, "CURRENT"), write)
+    for old in sorted(x for x in os.listdir(d) if x.startswith("v"))[:-SHARED_PANEL_KEEP]:
+        shutil.rmtree(os.path.join(d, old), ignore_errors=True)
+
+def _shared_panel(tickers, days: int) -> PricePanel:
+    d=_shared_panel_dir(tickers, days)
+    snap=_load_shared_panel(d)
+    if snap and snap[0]<SHARED_PANEL_TTL: return snap[1]
+    try:
+        with _file_lock(d+".lock"):
+            snap=_load_shared_panel(d)  # publié par un autre process pendant l’attente ?
+            if snap and snap[0]<SHARED_PANEL_TTL: return snap[1]
+            panel=_build_panel(tickers, days)
+            if panel.empty: return panel
+            os.makedirs(d, exist_ok=True)
+            _publish_shared_panel(d, panel)
+        _prune_shared_panels()
+    except OSError:
+        return _build_panel(tickers, days)  # dossier non inscriptible : panel local
+    snap=_load_shared_panel(d)
+    return snap[1] if snap else panel
+
+def _shared_panel_age(d: str) -> float:
+    """Âge (s) de la version la plus récente d’une clé (mtime du dossier si aucune)."""
+    try: vers=[int(x[1:]) for x in os.listdir(d) if x.startswith("v") and x[1:].isdigit()]
+    except OSError: return 0.0
+    if vers: return time.time()-max(vers)/1e9
+    try: return time.time()-os.path.getmtime(d)
+    except OSError: return 0.0
+
+def _prune_shared_panels(max_age=None):
+    """Supprime les clés (dossier, versions et verrou) dont la dernière version a plus de
+    `max_age` s. Une clé en cours de publication (verrou pris) est laissée en place ;
+    les workers qui mappent encore une version supprimée gardent leurs données (unlink)."""
+    max_age=SHARED_PANEL_TTL if max_age is None else max_age
+    try: keys=[k for k in os.listdir(SHARED_PANEL_DIR) if not k.endswith(".lock")]
+    except OSError: return
+    for k in keys:
+        d=os.path.join(SHARED_PANEL_DIR, k)
+        if not os.path.isdir(d) or _shared_panel_age(d)<max_age: continue
+        with _file_lock(d+".lock", blocking=False) as ok:
+            if not ok: continue
+            shutil.rmtree(d, ignore_errors=True)
+            try: os.remove(d+".lock")
+            except OSError: pass
+
+def _expire_shared_panels():
+    _prune_shared_panels(max_age=0)
+    # clés en cours de publication : au moins plus de version courante servie
+    try: keys=os.listdir(SHARED_PANEL_DIR)
+    except OSError: return
+    for k in keys:
+        try: os.remove(os.path.join(SHARED_PANEL_DIR, k, "CURRENT"))
+        except OSError: pass
+
+def fetch_panel(tickers, days=120) -> PricePanel:
+    """fetch_prices en PricePanel : même source (cache mémoire → panel partagé mappé →
+    stock disque → réseau), sans passer par le format long. Mis en cache (clé canonique)
+    dans l’espace « prices »."""
+    tickers=list(dict.fromkeys(t for t in tickers if t))
+    key=("pricepanel", tuple(sorted(tickers)), int(days))
+    hit, out = cache_get("prices", key)
+    if hit: return out
+    out=_shared_panel(tickers, int(days)) if tickers else PricePanel.from_long(None)
+    return cache_put("prices", key, out)
+
+METRIC_COLS = ["Ticker","Date","Close","ATR14","MA20","MA50","pct_1d","pct_7d","pct_30d"]
+_PANEL_DEPTH = 51  # MA50 + 1 barre pour PrevClose
+
+def _tail_panel(codes, pos, lens, depth, *cols):
+    """Aligne à droite les `depth` dernières barres de chaque ticker → tableaux (depth × tickers)."""
+    row=pos-(lens[codes]-depth); keep=row>=0
+    r, c = row[keep], codes[keep]
+    out=[]
+    for v in cols:
+        a=np.full((depth, len(lens)), np.nan); a[r, c]=v[keep]; out.append(a)
+    return out
+
+def _window_mean(a, w, min_periods):
+    win=a[-w:]; n=(~np.isnan(win)).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"): m=np.nansum(win, axis=0)/n
+    return np.where(n>=min_periods, m, np.nan)
+
+def _pct_change_last(close, n):
+    with np.errstate(invalid="ignore", divide="ignore"): return close[-1]/close[-1-n]-1
+
+def _metrics_frame(tickers, dates, closes, high, low, close) -> pd.DataFrame:
+    """Métriques au dernier point depuis des panneaux (barres × tickers) alignés à droite."""
+    depth=close.shape[0]
+    prev=np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+    tr=np.maximum(high-low, np.maximum(np.abs(high-prev), np.abs(low-prev)))
+    return pd.DataFrame({
+        "Ticker": tickers, "Date": dates, "Close": closes,
+        "ATR14": _window_mean(tr, 14, 5), "MA20": _window_mean(close, 20, 5), "MA50": _window_mean(close, 50, 10),
+        "pct_1d": _pct_change_last(close, 1) if depth>1 else np.nan,
+        "pct_7d": _pct_change_last(close, 7) if depth>7 else np.nan,
+        "pct_30d": _pct_change_last(close, 22) if depth>22 else np.nan,
+    })
+
+@timed("compute_metrics", lambda out, df: {"rows": 0 if df is None else len(df) if isinstance(df, pd.DataFrame)
+                                           else int(df.shape[0]*df.shape[1]), "tickers": len(out)})
+def compute_metrics(df) -> pd.DataFrame:
+    """Format long (Date, OHLC, Ticker) ou PricePanel → une ligne de métriques par ticker."""
+    if isinstance(df, PricePanel):
+        if df.empty: return pd.DataFrame(columns=METRIC_COLS)
+        high, low, close, last, cnt = df.tail(_PANEL_DEPTH)
+        keep=cnt>0; depth=min(_PANEL_DEPTH, int(cnt.max()))
+        return _metrics_frame(df.tickers[keep], df.dates[last[keep]], close[-1, keep],
+                              *(a[-depth:, keep] for a in (high, low, close))).reset_index(drop=True)
     if df is None or df.empty:
-        return pd.DataFrame(columns=["Ticker","Date","Close","ATR14","MA20","MA50","pct_1d","pct_7d","pct_30d"])
-    df=df.copy()
+        return pd.DataFrame(columns=METRIC_COLS)
     if "Date" not in df.columns:
         df=df.reset_index().rename(columns={df.index.name or "index":"Date"})
     need={"Ticker","Date","High","Low","Close"}
     if need - set(df.columns):
-        return pd.DataFrame(columns=["Ticker","Date","Close","ATR14","MA20","MA50","pct_1d","pct_7d","pct_30d"])
-    df=df.sort_values(["Ticker","Date"])
-    df["PrevClose"]=df.groupby("Ticker")["Close"].shift(1)
-    df["TR"]=np.maximum(df["High"]-df["Low"],
-                np.maximum((df["High"]-df["PrevClose"]).abs(), (df["Low"]-df["PrevClose"]).abs()))
-    df["ATR14"]=df.groupby("Ticker")["TR"].transform(lambda s:s.rolling(14,min_periods=5).mean())
-    df["MA20"]=df.groupby("Ticker")["Close"].transform(lambda s:s.rolling(20,min_periods=5).mean())
-    df["MA50"]=df.groupby("Ticker")["Close"].transform(lambda s:s.rolling(50,min_periods=10).mean())
-    def change(s,n): return (s.iloc[-1]/s.iloc[-(n+1)])-1 if len(s)>n else np.nan
-    p1=df.groupby("Ticker")["Close"].apply(lambda x:(x.iloc[-1]/x.iloc[-2])-1 if len(x)>=2 else np.nan).rename("pct_1d")
-    p7=df.groupby("Ticker")["Close"].apply(lambda x:change(x,7)).rename("pct_7d")
-    p30=df.groupby("Ticker")["Close"].apply(lambda x:change(x,22)).rename("pct_30d")
-    last=df.groupby("Ticker").tail(1)[["Ticker","Date","Close","ATR14","MA20","MA50"]]
-    out=(last.merge(p1,left_on="Ticker",right_index=True)
-              .merge(p7,left_on="Ticker",right_index=True)
-              .merge(p30,left_on="Ticker",right_index=True))
-    return out.reset_index(drop=True)
+        return pd.DataFrame(columns=METRIC_COLS)
+    df=df[df["Ticker"].notna()].sort_values(["Ticker","Date"])
+    if df.empty: return pd.DataFrame(columns=METRIC_COLS)
+    # Panel (barres × tickers) aligné sur la dernière barre de chaque ticker :
+    # les fenêtres glissantes ne sont évaluées qu’au dernier point, comme le `tail(1)` d’origine.
+    codes, tickers = pd.factorize(df["Ticker"], sort=True)
+    lens=np.bincount(codes, minlength=len(tickers))
+    ends=np.cumsum(lens)-1
+    pos=np.arange(len(df))-(ends-lens+1)[codes]
+    depth=min(_PANEL_DEPTH, int(lens.max()))
+    high, low, close = _tail_panel(codes, pos, lens, depth,
+        *(df[c].to_numpy(dtype=float) for c in ("High","Low","Close")))
+    last=df.iloc[ends].reset_index(drop=True)
+    return _metrics_frame(last["Ticker"], last["Date"], last["Close"], high, low, close)
+
+class IndicatorState:
+    """Indicateurs de compute_metrics maintenus barre par barre pour tout un univers :
+    anneaux (tickers × _PANEL_DEPTH) des OHLC/TR et sommes glissantes MA20/MA50/ATR14.
+    Une barre nouvelle ou révisant la dernière coûte O(1) par ticker ; une révision plus
+    ancienne (dans l’anneau) reconstruit seulement ce ticker. metrics() ≡ compute_metrics
+    sur tout l’historique reçu."""
+    WINDOWS = {"MA20": ("close", 20, 5), "MA50": ("close", 50, 10), "ATR14": ("tr", 14, 5)}
+    RESYNC = 1024  # passes incrémentales avant de recalculer les sommes (dérive flottante)
+
+    def __init__(self, prices: pd.DataFrame = None):
+        self.depth=_PANEL_DEPTH; self.index={}; self.tickers=[]; self.tz=None; self.ops=0
+        self._alloc(0)
+        if prices is not None: self.update(prices)
+
+    def _alloc(self, n):
+        D=self.depth; old=getattr(self, "close", None); k=0 if old is None else len(self.tickers)
+        def grow(a, fill, dtype=float, shape=(D,)):
+            out=np.full((n,)+shape, fill, dtype=dtype)
+            if old is not None: out[:k]=a[:k]
+            return out
+        self.high, self.low, self.close, self.tr = (grow(getattr(self, c, None), np.nan) for c in ("high","low","close","tr"))
+        self.dates=grow(getattr(self, "dates", None), np.datetime64("NaT"), "datetime64[ns]")
+        self.head=grow(getattr(self, "head", None), D-1, np.int64, ())
+        self.sums={w: grow(self.sums[w] if old is not None else None, 0.0, float, ()) for w in self.WINDOWS}
+        self.counts={w: grow(self.counts[w] if old is not None else None, 0, np.int64, ()) for w in self.WINDOWS}
+
+    def _rows(self, tickers) -> np.ndarray:
+        new=[t for t in dict.fromkeys(tickers) if t not in self.index]
+        if new:
+            n=len(self.tickers)+len(new)
+            if n>len(self.close): self._alloc(max(n, 2*len(self.close)))
+            for t in new: self.index[t]=len(self.tickers); self.tickers.append(t)
+        return np.array([self.index[t] for t in tickers], dtype=np.int64)
+
+    def _slots(self, rows, ages):
+        return (self.head[rows][:, None]-np.asarray(ages)[None, :])%self.depth
+
+    def _resum(self, rows):
+        for w,(src,n,_) in self.WINDOWS.items():
+            v=getattr(self, src)[rows[:, None], self._slots(rows, np.arange(n))]
+            self.sums[w][rows]=np.nansum(v, axis=1); self.counts[w][rows]=(~np.isnan(v)).sum(axis=1)
+
+    def _load(self, rows, dates, high, low, close):
+        """Réécrit les anneaux de `rows` depuis des panneaux (tickers × depth) alignés à droite."""
+        prev=np.hstack([np.full((len(rows), 1), np.nan), close[:, :-1]])
+        self.dates[rows]=dates; self.high[rows]=high; self.low[rows]=low; self.close[rows]=close
+        self.tr[rows]=np.maximum(high-low, np.maximum(np.abs(high-prev), np.abs(low-prev)))
+        self.head[rows]=self.depth-1
+        self._resum(rows)
+
+    def _window_move(self, rows, slot, new_c, new_tr, append):
+        for w,(s,n,_) in self.WINDOWS.items():
+            new=new_c if s=="close" else new_tr
+            old=getattr(self, s)[rows, (slot-n)%self.depth if append else slot]
+            self.sums[w][rows]+=np.nan_to_num(new)-np.nan_to_num(old)
+            self.counts[w][rows]+=(~np.isnan(new)).astype(np.int64)-(~np.isnan(old))
+
+    def _step(self, rows, dates, high, low, close, append):
+        D=self.depth
+        slot=(self.head[rows]+1)%D if append else self.head[rows]
+        prev=self.close[rows, (slot-1)%D]
+        tr=np.maximum(high-low, np.maximum(np.abs(high-prev), np.abs(low-prev)))
+        self._window_move(rows, slot, close, tr, append)
+        self.head[rows]=slot
+        self.dates[rows, slot]=dates; self.high[rows, slot]=high; self.low[rows, slot]=low
+        self.close[rows, slot]=close; self.tr[rows, slot]=tr
+
+    def _ordered(self, r):
+        s=self._slots(np.array([r]), np.arange(self.depth-1, -1, -1))[0]
+        return self.dates[r, s], self.high[r, s], self.low[r, s], self.close[r, s]
+
+    def _merge(self, r, date, high, low, close):
+        """Révision / insertion hors de la dernière barre : ce ticker est reconstruit (O(depth))."""
+        d, h, l, c = self._ordered(r)
+        known=~np.isnat(d)
+        if known.all() and date<d[0]: return  # plus ancienne que l’anneau : sans effet sur les fenêtres
+        k=np.searchsorted(d[known], date)+(~known).sum()
+        if k<self.depth and d[k]==date: h[k], l[k], c[k] = high, low, close
+        else:
+            d, h, l, c = (np.insert(a, k, v)[1:] for a,v in ((d,date),(h,high),(l,low),(c,close)))
+        self._load(np.array([r]), d[None], h[None], l[None], c[None])
+
+    def update(self, bars: pd.DataFrame):
+        """Applique des barres (format long Date, High, Low, Close, Ticker) : nouvelles dates
+        ajoutées, date égale à la dernière → barre révisée, date antérieure → fusion."""
+        if bars is None or bars.empty: return self
+        if "Date" not in bars.columns:
+            bars=bars.reset_index().rename(columns={bars.index.name or "index":"Date"})
+        df=bars[bars["Ticker"].notna()][["Ticker","Date","High","Low","Close"]].copy()
+        dt=df["Date"] if pd.api.types.is_datetime64_any_dtype(df["Date"]) else pd.to_datetime(df["Date"])
+        if dt.dt.tz is not None: self.tz=dt.dt.tz; dt=dt.dt.tz_localize(None)
+        df["Date"]=dt.astype("datetime64[ns]")
+        df=df.drop_duplicates(["Ticker","Date"], keep="last").sort_values(["Ticker","Date"], kind="stable")
+        if df.empty: return self
+        known=df["Ticker"].map(pd.Series(self.index, dtype=np.int64)) if self.index else pd.Series(np.nan, index=df.index)
+        seen=known.notna().to_numpy()
+        fresh=df[~seen]
+        if not fresh.empty:  # nouveaux tickers : amorçage vectorisé sur les `depth` dernières barres
+            codes, tickers = pd.factorize(fresh["Ticker"], sort=True)
+            lens=np.bincount(codes); ends=np.cumsum(lens)-1
+            pos=np.arange(len(fresh))-(ends-lens+1)[codes]
+            h, l, c = _tail_panel(codes, pos, lens, self.depth,
+                *(fresh[k].to_numpy(dtype=float) for k in ("High","Low","Close")))
+            row=pos-(lens[codes]-self.depth); keep=row>=0
+            d=np.full((self.depth, len(tickers)), np.datetime64("NaT"), dtype="datetime64[ns]")
+            d[row[keep], codes[keep]]=fresh["Date"].to_numpy()[keep]
+            self._load(self._rows(list(tickers)), d.T, h.T, l.T, c.T)
+        df=df[seen]
+        if df.empty: return self
+        rank=df.groupby("Ticker", sort=False).cumcount().to_numpy()
+        rows_all=known.to_numpy()[seen].astype(np.int64)
+        cols=[df[k].to_numpy(dtype=float) for k in ("High","Low","Close")]
+        dates=df["Date"].to_numpy()
+        for k in range(int(rank.max())+1):  # une passe par barre : O(1) par ticker et par barre
+            sel=rank==k; rows=rows_all[sel]; d=dates[sel]; h, l, c = (a[sel] for a in cols)
+            last=self.dates[rows, self.head[rows]]
+            for mask,append in ((np.isnat(last)|(d>last), True), (d==last, False)):
+                if mask.any(): self._step(rows[mask], d[mask], h[mask], l[mask], c[mask], append)
+            for i in np.flatnonzero(d<last): self._merge(rows[i], d[i], h[i], l[i], c[i])
+            self.ops+=1
+            if self.ops%self.RESYNC==0: self._resum(np.arange(len(self.tickers)))
+        return self
+
+    def last_dates(self, tickers) -> dict:
+        """Date de la dernière barre de chaque ticker connu (sans fuseau)."""
+        names=[t for t in dict.fromkeys(tickers) if t in self.index]
+        rows=np.array([self.index[t] for t in names], dtype=np.int64)
+        last=self.dates[rows, self.head[rows]] if names else []
+        return {t: pd.Timestamp(d) for t,d in zip(names, last) if not np.isnat(d)}
+
+    def metrics(self, tickers=None) -> pd.DataFrame:
+        """Mêmes colonnes et valeurs que compute_metrics (tickers triés)."""
+        names=sorted(self.tickers if tickers is None else [t for t in dict.fromkeys(tickers) if t in self.index])
+        if not names: return pd.DataFrame(columns=METRIC_COLS)
+        rows=np.array([self.index[t] for t in names], dtype=np.int64); head=self.head[rows]
+        out={"Ticker": names, "Date": pd.to_datetime(self.dates[rows, head]), "Close": self.close[rows, head]}
+        if self.tz is not None: out["Date"]=out["Date"].tz_localize(self.tz)
+        for w,(_,_,minp) in self.WINDOWS.items():
+            cnt=self.counts[w][rows]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out[w]=np.where(cnt>=minp, self.sums[w][rows]/cnt, np.nan)
+        for col,n in (("pct_1d",1),("pct_7d",7),("pct_30d",22)):
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out[col]=self.close[rows, head]/self.close[rows, (head-n)%self.depth]-1
+        return pd.DataFrame(out)[METRIC_COLS]
+
+LIVE_INTERVAL = 60  # secondes entre deux interrogations des barres du jour
+LIVE_MAX = 16       # états conservés (un par liste de tickers × days), les plus anciens sortent
+_LIVE = {}
+_LIVE_LOCK = threading.Lock()
+
+def live_metrics(tickers, days=120, interval=None) -> pd.DataFrame:
+    """Métriques « temps réel » : un IndicatorState amorcé par fetch_prices puis mis à jour
+    toutes les `interval` secondes avec les seules barres depuis la dernière date connue de
+    chaque ticker (revue, puis nouvelles), au lieu de recalculer toutes les fenêtres : un long
+    intervalle entre deux interrogations (process inactif, week-end) ne saute aucune séance."""
+    tickers=list(dict.fromkeys(t for t in tickers if t))
+    if not tickers: return pd.DataFrame(columns=METRIC_COLS)
+    key=(tuple(sorted(tickers)), int(days))
+    interval=LIVE_INTERVAL if interval is None else interval
+    with _LIVE_LOCK:  # réservation seulement : l’amorçage (disque / réseau) se fait hors du verrou global
+        entry=_LIVE.pop(key, None) or {"state": None, "polled": 0.0, "lock": threading.Lock()}
+        _LIVE[key]=entry  # réinsertion : ordre d’utilisation
+        while len(_LIVE)>LIVE_MAX: _LIVE.pop(next(iter(_LIVE)))
+    with entry["lock"]:
+        if entry["state"] is None:
+            entry["state"]=IndicatorState(fetch_prices(tickers, days=days)); entry["polled"]=time.monotonic()
+        elif time.monotonic()-entry["polled"]>=interval:
+            since={}
+            for t,d in entry["state"].last_dates(tickers).items():
+                since.setdefault(d.strftime("%Y-%m-%d"), []).append(t)
+            for start,ts in since.items():
+                entry["state"].update(_download_chunked(ts, start=start))
+            entry["polled"]=time.monotonic()
+        return entry["state"].metrics(tickers)
 
 # News & IA
-@lru_cache(maxsize=256)
-def google_news_titles(query: str, lang="fr"):
-    url=f"https://news.google.com/rss/search?q={requests.utils.quote(query)}&hl={lang}-{lang.upper()}&gl={lang.upper()}&ceid={lang.upper()}:{lang.upper()}"
+NEWS_RSS_URL = "https://news.google.com/rss/search"
+NEWS_DEADLINE = 15.0   # budget global (s) d’un lot news_summaries
+NEWS_MAX_WORKERS = 8
+NO_NEWS_TXT = "Pas d’actualité saillante — mouvement technique / macro."
+
+NEWS_CACHE_PATH = os.path.join(DATA_DIR, "news_cache.sqlite")
+NEWS_TTL = 1800                 # secondes avant de revalider un flux
+NEWS_CACHE_MAX_ENTRIES = 5000   # au-delà : éviction des requêtes les moins récemment lues
+_NEWS_DB_READY = None  # chemin de la base déjà initialisée
+
+def _expire_news_cache():
+    if not os.path.exists(NEWS_CACHE_PATH): return
+    con=_news_db()
     try:
-        xml=requests.get(url, headers=UA, timeout=12).text
-        import xml.etree.ElementTree as ET
-        root=ET.fromstring(xml)
-        items=[]
-        for it in root.iter("item"):
-            title=it.findtext("title") or ""
-            link=it.findtext("link") or ""
-            items.append((title, link))
-        return items[:6]
+        with con: con.execute("UPDATE news SET fetched=0")
+    finally: con.close()
+# les entrées vivent dans SQLite ; l’espace sert aux compteurs et à l’invalidation
+cache_namespace("news", ttl=NEWS_TTL, max_bytes=0, on_invalidate=_expire_news_cache)
+
+def _news_db():
+    global _NEWS_DB_READY
+    ready=_NEWS_DB_READY==NEWS_CACHE_PATH
+    if not ready: os.makedirs(os.path.dirname(NEWS_CACHE_PATH) or ".", exist_ok=True)
+    con=sqlite3.connect(NEWS_CACHE_PATH, timeout=10)
+    if not ready:
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("""CREATE TABLE IF NOT EXISTS news (
+            query TEXT, lang TEXT, fetched REAL, accessed REAL, etag TEXT, last_modified TEXT, items TEXT,
+            PRIMARY KEY (query, lang))""")
+        con.execute("CREATE INDEX IF NOT EXISTS news_accessed ON news(accessed)")
+        _NEWS_DB_READY=NEWS_CACHE_PATH
+    return con
+
+def _parse_news_rss(xml: str):
+    import xml.etree.ElementTree as ET
+    root=ET.fromstring(xml)
+    items=[]
+    for it in root.iter("item"):
+        title=it.findtext("title") or ""
+        link=it.findtext("link") or ""
+        items.append((title, link))
+    return items[:6]
+
+def _news_items(query: str, lang="fr"):
+    """Titres (title, link, score) d’une requête, via le cache disque partagé :
+    frais → aucune requête HTTP ; expiré → revalidation ETag/Last-Modified."""
+    import requests
+    now=time.time()
+    try:
+        con=_news_db()
     except Exception:
-        return []
+        con=None
+    row=None
+    if con is not None:
+        try:
+            row=con.execute("SELECT fetched, etag, last_modified, items FROM news WHERE query=? AND lang=?", (query, lang)).fetchone()
+        except Exception: row=None
+    try:
+        fresh=bool(row) and now-row[0]<NEWS_TTL
+        with _CACHE_LOCK:
+            ns=_CACHES["news"]
+            if fresh: ns.hits+=1
+            else: ns.misses+=1
+        if fresh:
+            try:
+                with con: con.execute("UPDATE news SET accessed=? WHERE query=? AND lang=?", (now, query, lang))
+            except sqlite3.Error: pass  # cache verrouillé / disque plein : on sert quand même
+            return [tuple(x) for x in json.loads(row[3])]
+        url=f"{NEWS_RSS_URL}?q={quote(query)}&hl={lang}-{lang.upper()}&gl={lang.upper()}&ceid={lang.upper()}:{lang.upper()}"
+        headers=dict(UA)
+        if row and row[1]: headers["If-None-Match"]=row[1]
+        if row and row[2]: headers["If-Modified-Since"]=row[2]
+        try:
+            with span("google_news_titles", query=query) as sp:
+                r=requests.get(url, headers=headers, timeout=12)
+                sp.add(status=r.status_code, bytes=len(r.content))
+            if r.status_code==304 and row:
+                items=[tuple(x) for x in json.loads(row[3])]
+            else:
+                r.raise_for_status()
+                parsed=_parse_news_rss(r.text)
+                items=[(t, l, s) for (t,l),s in zip(parsed, score_titles([t for t,_ in parsed]))]
+        except Exception:
+            return [tuple(x) for x in json.loads(row[3])] if row else []
+        if con is not None:
+            try:
+                with con:
+                    con.execute("INSERT OR REPLACE INTO news VALUES (?,?,?,?,?,?,?)",
+                                (query, lang, now, now, r.headers.get("ETag"), r.headers.get("Last-Modified"),
+                                 json.dumps(items, ensure_ascii=False)))
+                    con.execute("DELETE FROM news WHERE rowid IN (SELECT rowid FROM news ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                                (NEWS_CACHE_MAX_ENTRIES,))
+            except sqlite3.Error: pass
+        return items
+    finally:
+        if con is not None: con.close()
 
-def news_summary(name: str, ticker: str, lang="fr"):
-    items=google_news_titles(f"{name} {ticker}", lang) or google_news_titles(name, lang)
-    titles=[t for t,_ in items]
-    if not titles:
-        return ("Pas d’actualité saillante — mouvement technique / macro.", 0.0, [])
-    POS=["résultats","bénéfice","contrat","relève","guidance","record","upgrade","partenariat","dividende","approbation"]
-    NEG=["profit warning","retard","procès","amende","downgrade","abaisse","enquête","rappel","départ","incident"]
-    scores=[]
-    for t in titles:
-        s=0.0
-        if SIA:
-            try: s=SIA.polarity_scores(t.lower())["compound"]
-            except Exception: s=0.0
-        tl=t.lower()
-        if any(k in tl for k in POS): s+=0.2
-        if any(k in tl for k in NEG): s-=0.2
-        scores.append(s)
-    m=float(np.mean(scores)) if scores else 0.0
+def google_news_titles(query: str, lang="fr"):
+    return [(t, l) for t,l,_ in _news_items(query, lang)]
+
+NEWS_POS = ["résultats","bénéfice","contrat","relève","guidance","record","upgrade","partenariat","dividende","approbation"]
+NEWS_NEG = ["profit warning","retard","procès","amende","downgrade","abaisse","enquête","rappel","départ","incident"]
+_POS_RE = re.compile("|".join(map(re.escape, NEWS_POS)))
+_NEG_RE = re.compile("|".join(map(re.escape, NEWS_NEG)))
+_SCORE_MEMO = {}
+_SCORE_MEMO_MAX = 50000
+
+@timed("sentiment", lambda out, titles: {"titles": len(out)})
+def score_titles(titles) -> list:
+    """Score de sentiment par titre (VADER + mots-clés FR ±0.2), mémorisé par titre :
+    un même titre remonté pour plusieurs tickers n’est évalué qu’une fois."""
+    memo=_SCORE_MEMO; out={}; new={}; sia=None
+    for t in dict.fromkeys(titles):
+        s=memo.get(t)
+        if s is None:
+            tl=t.lower(); s=0.0
+            sia=sia or get_sia()
+            if sia:
+                try: s=sia.polarity_scores(tl)["compound"]
+                except Exception: s=0.0
+            if _POS_RE.search(tl): s+=0.2
+            if _NEG_RE.search(tl): s-=0.2
+            new[t]=s
+        out[t]=s
+    if new:
+        if len(memo)+len(new)>_SCORE_MEMO_MAX: memo.clear()
+        memo.update(new)
+    return [out[t] for t in titles]
+
+def _summarize_news(items):
+    """items : (title, link, score) → (txt, score moyen, [(title, link)])."""
+    if not items:
+        return (NO_NEWS_TXT, 0.0, [])
+    m=float(np.mean([s for _,_,s in items]))
     if m>0.15: txt="Hausse soutenue par des nouvelles positives."
     elif m<-0.15: txt="Baisse liée à des nouvelles défavorables."
     else: txt="Actualité mitigée/neutre — mouvement surtout technique."
-    return (txt, m, items)
+    return (txt, m, [(t, l) for t,l,_ in items])
+
+def news_summary(name: str, ticker: str, lang="fr"):
+    items=_news_items(f"{name} {ticker}", lang) or _news_items(name, lang)
+    return _summarize_news(items)
+
+def iter_news_summaries(pairs, lang="fr", deadline=None):
+    """Génère (position, résumé) pour chaque (nom, ticker) dès que sa réponse est définitive :
+    flux RSS récupérés en parallèle, requête de repli (nom seul) uniquement pour les réponses
+    vides. Au-delà du délai global, les lignes manquantes reçoivent le résumé « pas d’actualité »."""
+    pairs=[(str(n), str(t)) for n,t in pairs]
+    if not pairs: return
+    end=time.monotonic()+(NEWS_DEADLINE if deadline is None else deadline)
+    pending=set(range(len(pairs)))
+    ex=ThreadPoolExecutor(max_workers=NEWS_MAX_WORKERS)
+    futs={}
+    def submit(query, rows, fallback):
+        futs[ex.submit(_in_scope(_news_items), query, lang)]=(rows, fallback)
+    try:
+        first={}
+        for i,(n,t) in enumerate(pairs): first.setdefault(f"{n} {t}", []).append(i)
+        for q,rows in first.items(): submit(q, rows, True)
+        while futs:
+            done,_=wait(futs, timeout=max(0.0, end-time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done: break
+            retry={}
+            for f in done:
+                rows, fallback = futs.pop(f)
+                try: res=f.result()
+                except Exception: res=[]  # échec d’une requête : traité comme une réponse vide (repli)
+                if not res and fallback:
+                    for i in rows: retry.setdefault(pairs[i][0], []).append(i)
+                    continue
+                summary=_summarize_news(res or [])
+                for i in rows: pending.discard(i); yield i, summary
+            for q,rows in retry.items(): submit(q, rows, False)
+    finally:
+        ex.shutdown(wait=False, cancel_futures=True)
+    for i in sorted(pending): yield i, _summarize_news([])
+
+def news_summaries(pairs, lang="fr", deadline=None):
+    """news_summary pour une liste de (nom, ticker), dans l’ordre (voir iter_news_summaries)."""
+    out=[None]*len(pairs)
+    for i,summary in iter_news_summaries(pairs, lang, deadline): out[i]=summary
+    return out
 
 def decision_label_from_row(row, held=False, vol_max=0.05):
     px=float(row.get("Close", math.nan))
@@ -266,6 +1321,83 @@ def price_levels_from_row(row, profile="Neutre"):
     entry  = base * params["entry_mult"]
     return {"entry": round(entry,2), "target": round(target,2), "stop": round(stop,2)}
 
+def _num_col(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns: return np.full(len(df), np.nan)
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+
+def _round2(a) -> np.ndarray:
+    """round(x, 2) de Python, vectorisé : np.round ne diffère qu’aux quasi-égalités à ,5
+    (erreur de x*100), recalculées une à une."""
+    a=np.asarray(a, dtype=float); r=np.round(a, 2)
+    with np.errstate(invalid="ignore"):
+        h=a*100; tie=np.isfinite(a) & (np.abs(np.abs(h-np.trunc(h))-0.5)<1e-6)
+    if tie.any(): r[tie]=[round(float(x), 2) for x in a[tie]]
+    return r
+
+def decision_scores(df: pd.DataFrame, vol_max=0.05) -> np.ndarray:
+    """Score de decision_label_from_row pour toutes les lignes (NaN si Close invalide)."""
+    return _decision_score_arrays(*(_num_col(df, c) for c in ("Close","MA20","MA50","ATR14","PRU")), vol_max)
+
+def _decision_score_arrays(px, ma20, ma50, atr, pru, vol_max):
+    """Règle de decision_label_from_row sur des tableaux de même forme (ou scalaires diffusés)."""
+    ok=np.isfinite(px)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        vol=np.where(np.isfinite(atr) & (px>0), atr/px, 0.03)
+        trend=(np.isfinite(ma20) & (px>=ma20)).astype(int)+(np.isfinite(ma50) & (px>=ma50)).astype(int)
+        pru_ok=np.isfinite(pru) & (pru>0)
+        pru_term=np.where(pru_ok, np.where(px>pru*1.02, 1, np.where(px<pru*0.98, -1, 0)), 0)
+    score=0.0+0.4*np.where(trend==2, 1, np.where(trend==1, 0, -1))
+    score=score+0.2*pru_term  # +0.0 quand pas de PRU : même arrondi flottant que la version ligne à ligne
+    score=score+0.2*np.where(vol>vol_max, -1, 1)
+    return np.where(ok, score, np.nan)
+
+def decision_labels(df: pd.DataFrame, held=False, vol_max=0.05) -> pd.Series:
+    """decision_label_from_row appliqué à tout le DataFrame, sans boucle Python."""
+    score=decision_scores(df, vol_max)
+    with np.errstate(invalid="ignore"):
+        if held: lab=np.where(score>0.4, "🟢 Acheter", np.where(score<-0.2, "🔴 Vendre", "🟠 Garder"))
+        else: lab=np.where(score>0.3, "🟢 Acheter", np.where(score<-0.2, "🚫 Éviter", "👁️ Surveiller"))
+    lab=np.where(np.isnan(score), "👁️ Surveiller", lab)
+    return pd.Series(lab, index=df.index, dtype=object)
+
+def price_levels(df: pd.DataFrame, profile="Neutre") -> pd.DataFrame:
+    """price_levels_from_row pour toutes les lignes → colonnes entry / target / stop."""
+    params=get_profile_params(profile)
+    px, ma20 = _num_col(df, "Close"), _num_col(df, "MA20")
+    base=np.where(np.isfinite(ma20), ma20, px)
+    ok=np.isfinite(base)
+    out={k: np.where(ok, _round2(base*params[f"{k}_mult"]), np.nan) for k in ("entry","target","stop")}
+    return pd.DataFrame(out, index=df.index)
+
+# Tables « Analyses IA » des pages Marché Global et Par Indice (aussi mesurées par bench_suite)
+NEWS_PENDING_TXT = "⏳ …"
+
+def news_pairs(df: pd.DataFrame) -> list:
+    """(nom, ticker) de chaque ligne, pour news_summaries / iter_news_summaries."""
+    return list(zip(df.get("name", df["Ticker"]), df["Ticker"]))
+
+def ai_table(df: pd.DataFrame, value_col="pct_1d", profile="Neutre", news=None, price=False, summary=True) -> pd.DataFrame:
+    """Une ligne par ticker : variation, niveaux de prix et décision du profil, puis résumé
+    d’actualité et sentiment pris dans `news` (news_summary par ligne, dans l’ordre) ; sans
+    `news`, emplacements en attente remplis ensuite par set_ai_news. `price` ajoute le cours."""
+    names=df.get("name", df["Ticker"]); ticks=df["Ticker"]
+    levels=price_levels(df, profile)
+    var=df[value_col] if value_col in df.columns else pd.Series(0.0, index=df.index)
+    cols={"Nom":names.to_numpy(), "Ticker":ticks.to_numpy()}
+    if price: cols["Cours"]=df["Close"].astype(float).round(2).to_numpy()
+    cols.update({"Var%":(var*100).round(2).to_numpy(),
+                 "Entrée (€)":levels["entry"].to_numpy(),"Objectif (€)":levels["target"].to_numpy(),"Stop (€)":levels["stop"].to_numpy(),
+                 "Décision IA":decision_labels(df, held=False, vol_max=get_profile_params(profile)["vol_max"]).to_numpy()})
+    if summary: cols["Actu (résumé)"]=[txt for txt,_,_ in news] if news is not None else [NEWS_PENDING_TXT]*len(df)
+    cols["Sentiment"]=[round(score,2) for _,score,_ in news] if news is not None else np.full(len(df), np.nan)
+    return pd.DataFrame(cols)
+
+def set_ai_news(table: pd.DataFrame, i: int, summary):
+    """Renseigne la ligne `i` d’une ai_table avec son news_summary (rendu progressif)."""
+    txt, score, _ = summary
+    if "Actu (résumé)" in table.columns: table.loc[i, "Actu (résumé)"]=txt
+    table.loc[i, "Sentiment"]=round(score,2)
+
 def style_variations(df: pd.DataFrame, cols: list[str]):
     def color_var(v):
         if pd.isna(v): return ""
@@ -275,18 +1407,729 @@ def style_variations(df: pd.DataFrame, cols: list[str]):
     sty=df.style
     for c in cols:
         if c in df.columns:
-            sty=sty.applymap(color_var, subset=[c])
+            sty=sty.map(color_var, subset=[c])  # Styler.applymap retiré en pandas 3
     return sty
 
-def fetch_all_markets(markets_and_watchlists, days_hist=90) -> pd.DataFrame:
-    frames=[]
+def top_k(df: pd.DataFrame, col: str, k=5, ascending=False) -> pd.DataFrame:
+    """Les k meilleures (ou pires) lignes sur `col`, NaN exclus, par sélection partielle
+    (np.argpartition) plutôt que par un tri complet du DataFrame."""
+    v=pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float) if col in df.columns else np.array([])
+    idx=np.flatnonzero(np.isfinite(v))
+    if not len(idx): return df.iloc[:0]
+    key=v[idx] if ascending else -v[idx]
+    if len(idx)>k:
+        part=np.argpartition(key, k-1)[:k]; idx, key = idx[part], key[part]
+    return df.iloc[idx[np.argsort(key, kind="stable")]]
+
+def _plan_market_fetch(markets_and_watchlists):
+    """Constituants par indice + union dédupliquée des tickers à télécharger."""
+    plan=[]
     for (idx, wl) in markets_and_watchlists:
         mem=members(idx)
-        if mem.empty: continue
-        px=fetch_prices(mem["ticker"].tolist(), days=days_hist)
-        if px.empty: continue
-        met=compute_metrics(px).merge(mem, left_on="Ticker", right_on="ticker", how="left")
+        if not mem.empty: plan.append((idx, mem))
+    union=list(dict.fromkeys(t for _,mem in plan for t in mem["ticker"]))
+    return plan, union
+
+def fetch_all_markets(markets_and_watchlists, days_hist=90) -> pd.DataFrame:
+    plan, union = _plan_market_fetch(markets_and_watchlists)
+    if not union: return pd.DataFrame()
+    px=fetch_panel(union, days=days_hist)
+    if px.empty: return pd.DataFrame()
+    allmet=compute_metrics(px)
+    frames=[]
+    for idx, mem in plan:
+        met=allmet[allmet["Ticker"].isin(mem["ticker"])].merge(mem, left_on="Ticker", right_on="ticker", how="left")
+        if met.empty: continue
         met["Indice"]=idx
         frames.append(met)
     if not frames: return pd.DataFrame()
     return pd.concat(frames, ignore_index=True, sort=False)
+
+# Market snapshots : calculés en tâche de fond, les pages ne font que lire
+ALL_MARKETS = [("CAC 40",""),("DAX 40",""),("NASDAQ 100",""),("S&P 500",""),("Dow Jones","")]
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshots")
+SNAPSHOT_DAYS = (30, 60, 90, 150)   # days_hist utilisés par les pages
+SNAPSHOT_INTERVAL = 900             # secondes entre deux reconstructions
+SNAPSHOT_MAX_AGE = 4*SNAPSHOT_INTERVAL  # au-delà, le lecteur reconstruit lui-même (rafraîchisseur absent ou bloqué)
+SNAPSHOT_REFRESHER_ENABLED = os.environ.get("DASH_SNAPSHOT_REFRESHER", "1")!="0"
+MOVERS_K = 5
+_SNAPSHOT_MEMO = {}
+_REFRESHER = None
+_REFRESHER_LOCK = threading.Lock()
+
+def _snapshot_path(days_hist: int) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"market_{int(days_hist)}d.pkl")
+
+def build_market_snapshot(days_hist: int, markets=None) -> dict:
+    """Métriques de tout l’univers + top/low par horizon (pct_1d/7d/30d)."""
+    return _snapshot_from(fetch_all_markets(markets or ALL_MARKETS, days_hist=days_hist), days_hist)
+
+def _snapshot_from(data: pd.DataFrame, days_hist: int) -> dict:
+    movers={}
+    for col in ("pct_1d","pct_7d","pct_30d"):
+        if col not in data.columns: continue
+        movers[col]=(top_k(data, col, MOVERS_K, ascending=False), top_k(data, col, MOVERS_K, ascending=True))
+    return {"built_at": time.time(), "days_hist": int(days_hist), "data": data, "movers": movers}
+
+def publish_snapshot(snap: dict) -> str:
+    p=_snapshot_path(snap["days_hist"])
+    _atomic_write(p, lambda tmp: pd.to_pickle(snap, tmp))
+    return p
+
+def load_snapshot(days_hist: int):
+    """Dernier instantané publié (relu seulement si le fichier a changé), ou None."""
+    p=_snapshot_path(days_hist)
+    try: st=os.stat(p); stamp=(st.st_mtime_ns, st.st_size)
+    except OSError: return None
+    memo=_SNAPSHOT_MEMO.get(p)
+    if memo and memo[0]==stamp: return memo[1]
+    try: snap=pd.read_pickle(p)
+    except Exception: return None
+    _SNAPSHOT_MEMO[p]=(stamp, snap)
+    return snap
+
+def snapshot_age(snap) -> float:
+    return time.time()-snap["built_at"] if snap else math.inf
+
+def refresh_snapshots(days_list=SNAPSHOT_DAYS, markets=None) -> list:
+    """Reconstruit et publie un instantané par days_hist ; renvoie les chemins écrits."""
+    paths=[]
+    for d in days_list:
+        snap=build_market_snapshot(d, markets)
+        if snap["data"].empty: continue
+        paths.append(publish_snapshot(snap))
+    return paths
+
+def start_snapshot_refresher(interval=None, days_list=SNAPSHOT_DAYS):
+    """Lance (une seule fois par process) le thread qui republie les instantanés.
+    Désactivable avec DASH_SNAPSHOT_REFRESHER=0 quand un cron s’en charge."""
+    global _REFRESHER
+    if not SNAPSHOT_REFRESHER_ENABLED: return None
+    with _REFRESHER_LOCK:
+        if _REFRESHER is not None and _REFRESHER.is_alive(): return _REFRESHER
+        def loop():
+            every=interval or SNAPSHOT_INTERVAL
+            while True:
+                try:
+                    # un seul worker reconstruit ; les autres relisent les instantanés publiés
+                    with _file_lock(os.path.join(SNAPSHOT_DIR, ".refresh.lock"), blocking=False) as mine:
+                        stale=[d for d in days_list if snapshot_age(load_snapshot(d))>=every/2]
+                        if mine and stale: refresh_snapshots(stale)
+                except Exception: pass
+                time.sleep(every)
+        _REFRESHER=threading.Thread(target=loop, name="market-snapshots", daemon=True)
+        _REFRESHER.start()
+    return _REFRESHER
+
+def _drop_snapshots():
+    _SNAPSHOT_MEMO.clear()
+    for d in SNAPSHOT_DAYS:
+        try: os.remove(_snapshot_path(d))
+        except OSError: pass
+# rien en mémoire : l’espace sert au hook d’invalidation des instantanés publiés
+cache_namespace("snapshots", ttl=SNAPSHOT_INTERVAL, max_bytes=0, on_invalidate=_drop_snapshots)
+
+def market_snapshot(days_hist: int) -> dict:
+    """Instantané publié si disponible, sinon calcul synchrone (premier démarrage, juste après
+    invalidate("snapshots"), ou instantané plus vieux que SNAPSHOT_MAX_AGE) aussitôt publié
+    pour les autres sessions. Lance le rafraîchisseur de fond du process au premier appel."""
+    start_snapshot_refresher()
+    snap=load_snapshot(days_hist)
+    if snapshot_age(snap)<=SNAPSHOT_MAX_AGE: return snap
+    with _file_lock(os.path.join(SNAPSHOT_DIR, ".refresh.lock")):
+        snap=load_snapshot(days_hist)  # reconstruit par un autre worker pendant l’attente ?
+        if snapshot_age(snap)<=SNAPSHOT_MAX_AGE: return snap
+        fresh=build_market_snapshot(days_hist)
+        if fresh["data"].empty: return snap or fresh  # réseau coupé : l’ancien vaut mieux que rien
+        publish_snapshot(fresh)
+    return fresh
+
+# Pipeline progressif : résultats livrés étape par étape, chacune avec son budget de temps,
+# pour que les pages affichent ce qui est prêt sans attendre l’indice ou le flux le plus lent
+PIPELINE_BUDGETS = {"index": 30.0, "news": NEWS_DEADLINE}  # secondes par étape ; movers : calcul local
+PipelineEvent = namedtuple("PipelineEvent", "stage key value elapsed")
+
+def market_pipeline(days_hist: int, value_col="pct_1d", budgets=None, markets=None, lang="fr"):
+    """Génère des PipelineEvent(stage, key, value, elapsed), `elapsed` en s depuis l’appel :
+    - ("index", indice, métriques, ou None si hors budget) dès que chaque indice est prêt ;
+    - ("movers", value_col, (top, low)) sur les indices reçus ;
+    - ("news", ("top"|"low", position), (texte, score, articles)) ligne par ligne ;
+    - ("done", None, {"built_at", "late"}) en dernier.
+    L’instantané publié sert tous les indices d’un coup ; sinon chaque indice est calculé dans
+    son thread et l’instantané n’est publié que si tous ont répondu dans le budget."""
+    t0=time.monotonic()
+    budgets={**PIPELINE_BUDGETS, **(budgets or {})}
+    ev=lambda stage, key, value: PipelineEvent(stage, key, value, time.monotonic()-t0)
+    shared=markets is None
+    markets=markets or ALL_MARKETS
+    snap=None
+    if shared:
+        start_snapshot_refresher()
+        snap=load_snapshot(days_hist)
+        if snapshot_age(snap)>SNAPSHOT_MAX_AGE: snap=None  # trop vieux : recalcul progressif, puis publication
+    late=[]
+    if snap is not None:
+        data=snap["data"]
+        for idx,_ in markets:
+            yield ev("index", idx, data[data["Indice"]==idx] if "Indice" in data.columns else data.iloc[:0])
+    else:
+        frames=[]
+        ex=ThreadPoolExecutor(max_workers=len(markets))
+        futs={ex.submit(_in_scope(fetch_all_markets), [m], days_hist): m[0] for m in markets}
+        end=time.monotonic()+budgets["index"]
+        try:
+            while futs:
+                done,_=wait(futs, timeout=max(0.0, end-time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done: break
+                for f in done:
+                    idx=futs.pop(f)
+                    try: df=f.result()
+                    except Exception: df=pd.DataFrame()
+                    if not df.empty: frames.append(df)
+                    yield ev("index", idx, df)
+        finally:
+            ex.shutdown(wait=False, cancel_futures=True)  # les retardataires finissent en fond et remplissent le stock
+        late=list(futs.values())
+        for idx in late: yield ev("index", idx, None)
+        snap=_snapshot_from(pd.concat(frames, ignore_index=True, sort=False) if frames else pd.DataFrame(), days_hist)
+        if shared and not late and not snap["data"].empty: publish_snapshot(snap)
+    none=pd.DataFrame(columns=list(snap["data"].columns) or ["Ticker"])
+    top, low = snap["movers"].get(value_col, (none, none))
+    yield ev("movers", value_col, (top, low))
+    rows=[("top", i) for i in range(len(top))]+[("low", i) for i in range(len(low))]
+    pairs=news_pairs(top)+news_pairs(low)
+    for i,summary in iter_news_summaries(pairs, lang, budgets["news"]):
+        yield ev("news", rows[i], summary)
+    yield ev("done", None, {"built_at": snap["built_at"], "late": late})
+
+# Screener : table de métriques matérialisée une fois par instantané
+SCREENER_METRICS = {
+    "pct_1d": "Variation 1 jour", "pct_7d": "Variation 7 jours", "pct_30d": "Variation 30 jours",
+    "atr_pct": "Volatilité (ATR14 / cours)", "dist_ma20": "Écart à la MA20", "dist_ma50": "Écart à la MA50",
+}
+cache_namespace("screener", ttl=SNAPSHOT_INTERVAL, max_bytes=64*2**20)
+
+class ScreenerTable:
+    """Univers complet (une ligne par ticker, indices regroupés) avec colonnes dérivées,
+    décision IA par profil et ordres de tri précalculés pour chaque métrique : un
+    changement de filtre ne coûte qu’un masque booléen et un découpage."""
+    def __init__(self, data: pd.DataFrame):
+        if data is None or data.empty:
+            df=pd.DataFrame(columns=["Ticker","name","Indice"]+METRIC_COLS[1:])
+        else:
+            idx=data.groupby("Ticker", sort=False)["Indice"].agg(lambda s: ", ".join(dict.fromkeys(s)))
+            df=data.drop_duplicates(subset=["Ticker"]).set_index("Ticker")
+            df["Indice"]=idx; df=df.reset_index()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            close=_num_col(df, "Close")
+            df["atr_pct"]=_num_col(df, "ATR14")/close
+            df["dist_ma20"]=close/_num_col(df, "MA20")-1
+            df["dist_ma50"]=close/_num_col(df, "MA50")-1
+        for p, params in PROFILE_PARAMS.items():
+            df[f"decision_{p}"]=decision_labels(df, held=False, vol_max=params["vol_max"]).to_numpy()
+        self.df=df
+        self.values={m: _num_col(df, m) for m in SCREENER_METRICS}
+        self.orders={}
+        for m,v in self.values.items():
+            finite=np.flatnonzero(np.isfinite(v))
+            asc=finite[np.argsort(v[finite], kind="stable")]
+            self.orders[(m, True)]=asc
+            self.orders[(m, False)]=finite[np.argsort(-v[finite], kind="stable")]
+        self.index_members={i: df["Indice"].str.contains(i, regex=False).to_numpy() for i in INDEX_SOURCES}
+
+    def __len__(self): return len(self.df)
+    def __sizeof__(self):
+        return int(self.df.memory_usage(index=True).sum())+sum(v.nbytes for v in self.values.values())+sum(o.nbytes for o in self.orders.values())
+
+    def mask(self, indices=None, decisions=None, profile="Neutre", ranges=None) -> np.ndarray:
+        """Filtre : indices (liste), labels de décision du profil, bornes {métrique: (min, max)}."""
+        m=np.ones(len(self.df), dtype=bool)
+        if indices:
+            m&=np.logical_or.reduce([self.index_members.get(i, np.zeros(len(self.df), bool)) for i in indices])
+        if decisions:
+            m&=self.df[f"decision_{profile}"].isin(decisions).to_numpy()
+        for metric,(lo,hi) in (ranges or {}).items():
+            v=self.values[metric]
+            with np.errstate(invalid="ignore"):
+                if lo is not None: m&=v>=lo
+                if hi is not None: m&=v<=hi
+        return m
+
+    def top(self, metric: str, k=20, ascending=False, mask=None) -> pd.DataFrame:
+        order=self.orders[(metric, ascending)]
+        if mask is not None: order=order[mask[order]]
+        return self.df.iloc[order[:k]]
+
+def screener_table(snap: dict) -> ScreenerTable:
+    """ScreenerTable de l’instantané, construite une seule fois (clé = date de calcul)."""
+    key=(snap.get("days_hist"), snap.get("built_at"))
+    hit, table = cache_get("screener", key)
+    if hit: return table
+    return cache_put("screener", key, ScreenerTable(snap["data"]))
+
+# Portefeuille : stockage SQLite (WAL) avec journal des opérations
+PORTFOLIO_DB_PATH = os.path.join(DATA_DIR, "portfolio.sqlite")
+PORTFOLIO_COLS = ["Name","Ticker","Account","Quantity","PRU"]
+_PORTFOLIO_DB_READY = None  # chemin de la base déjà initialisée
+
+def _portfolio_db():
+    global _PORTFOLIO_DB_READY
+    ready=_PORTFOLIO_DB_READY==PORTFOLIO_DB_PATH
+    if not ready: os.makedirs(os.path.dirname(PORTFOLIO_DB_PATH) or ".", exist_ok=True)
+    con=sqlite3.connect(PORTFOLIO_DB_PATH, timeout=10)
+    if not ready:
+        con.execute("PRAGMA journal_mode=WAL")
+        with con:
+            con.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+            INSERT OR IGNORE INTO meta VALUES ('version', 0);
+            CREATE TABLE IF NOT EXISTS portfolios (name TEXT PRIMARY KEY, created REAL);
+            CREATE TABLE IF NOT EXISTS lines (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, portfolio TEXT NOT NULL, name TEXT, ticker TEXT,
+                account TEXT, quantity REAL, pru REAL, version INTEGER, deleted INTEGER DEFAULT 0);
+            CREATE INDEX IF NOT EXISTS lines_portfolio_version ON lines(portfolio, version);
+            CREATE INDEX IF NOT EXISTS lines_ticker ON lines(ticker);
+            CREATE INDEX IF NOT EXISTS lines_account ON lines(account);
+            CREATE TABLE IF NOT EXISTS trades (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL, portfolio TEXT, line_id INTEGER, action TEXT,
+                ticker TEXT, account TEXT, quantity REAL, pru REAL);
+            CREATE INDEX IF NOT EXISTS trades_ticker ON trades(ticker);
+            """)
+        _migrate_portfolio_json(con)
+        _PORTFOLIO_DB_READY=PORTFOLIO_DB_PATH
+    return con
+
+def _bump_version(con) -> int:
+    con.execute("UPDATE meta SET value=value+1 WHERE key='version'")
+    return con.execute("SELECT value FROM meta WHERE key='version'").fetchone()[0]
+
+def _migrate_portfolio_json(con):
+    """Import unique des anciens data/portfolio_*.json (les fichiers sont laissés en place)."""
+    with con:
+        con.execute("BEGIN IMMEDIATE")  # deux process au démarrage : une seule migration
+        if con.execute("SELECT 1 FROM meta WHERE key='migrated_json'").fetchone(): return
+        for name in ("PEA","CTO","GLOBAL"):
+            p=os.path.join(DATA_DIR, f"portfolio_{name}.json")
+            if not os.path.exists(p): continue
+            try: df=pd.read_json(p)
+            except Exception: continue
+            if not df.empty: _write_lines(con, name, [_line_values(r) for _,r in df.iterrows()], [], [])
+        con.execute("INSERT OR REPLACE INTO meta VALUES ('migrated_json', 1)")
+
+def _line_values(r) -> tuple:
+    def txt(k): v=r.get(k); return None if v is None or (isinstance(v, float) and math.isnan(v)) else str(v)
+    def num(k):
+        try: v=float(r.get(k)); return None if math.isnan(v) else v
+        except (TypeError, ValueError): return None
+    return (txt("Name"), txt("Ticker"), txt("Account"), num("Quantity"), num("PRU"))
+
+def _write_lines(con, portfolio, inserts, updates, deletes):
+    """Applique inserts [(vals)], updates [(id, vals)], deletes [id] dans la transaction courante."""
+    if not (inserts or updates or deletes): return
+    v=_bump_version(con); now=time.time()
+    con.execute("INSERT OR IGNORE INTO portfolios VALUES (?,?)", (portfolio, now))
+    log=[]
+    for vals in inserts:
+        cur=con.execute("INSERT INTO lines (portfolio,name,ticker,account,quantity,pru,version) VALUES (?,?,?,?,?,?,?)", (portfolio,)+vals+(v,))
+        log.append((now, portfolio, cur.lastrowid, "add", vals[1], vals[2], vals[3], vals[4]))
+    for lid, vals in updates:
+        con.execute("UPDATE lines SET name=?,ticker=?,account=?,quantity=?,pru=?,version=? WHERE id=? AND portfolio=?", vals+(v, lid, portfolio))
+        log.append((now, portfolio, lid, "update", vals[1], vals[2], vals[3], vals[4]))
+    for lid in deletes:
+        con.execute("UPDATE lines SET deleted=1, version=? WHERE id=? AND portfolio=?", (v, lid, portfolio))
+        log.append((now, portfolio, lid, "delete", None, None, None, None))
+    con.executemany("INSERT INTO trades (ts,portfolio,line_id,action,ticker,account,quantity,pru) VALUES (?,?,?,?,?,?,?,?)", log)
+
+def load_portfolio(name: str, since=None):
+    """(lignes, version). Avec `since`, seulement les lignes modifiées depuis cette version,
+    suppressions comprises (colonne `deleted`)."""
+    con=_portfolio_db()
+    try:
+        version=con.execute("SELECT value FROM meta WHERE key='version'").fetchone()[0]
+        q="SELECT id,name,ticker,account,quantity,pru,deleted FROM lines WHERE portfolio=?"
+        args=[name]
+        if since is None: q+=" AND deleted=0"
+        else: q+=" AND version>?"; args.append(since)
+        rows=con.execute(q+" ORDER BY id", args).fetchall()
+    finally: con.close()
+    df=pd.DataFrame(rows, columns=["id"]+PORTFOLIO_COLS+["deleted"])
+    return (df if since is not None else df.drop(columns="deleted")), version
+
+def sync_portfolio(name: str, state=None):
+    """Portefeuille à jour à partir d’un état précédent (df, version) : seules les lignes
+    modifiées depuis sont relues. Renvoie le nouvel état."""
+    if state is None:
+        return load_portfolio(name)
+    df, version = state
+    delta, new_version = load_portfolio(name, since=version)
+    if delta.empty: return df, new_version
+    gone=set(delta.loc[delta["deleted"]==1, "id"])
+    live=delta.loc[delta["deleted"]==0].drop(columns="deleted")
+    df=df[~df["id"].isin(gone | set(live["id"]))]
+    df=pd.concat([df, live], ignore_index=True).sort_values("id").reset_index(drop=True)
+    return df, new_version
+
+def add_portfolio_line(name: str, row: dict) -> int:
+    con=_portfolio_db()
+    try:
+        with con:
+            _write_lines(con, name, [_line_values(row)], [], [])
+            return con.execute("SELECT MAX(id) FROM lines WHERE portfolio=?", (name,)).fetchone()[0]
+    finally: con.close()
+
+def save_portfolio(name: str, df: pd.DataFrame):
+    """Enregistre l’état édité en une transaction : insertions (lignes sans id),
+    mises à jour des seules lignes modifiées, suppressions des id disparus."""
+    con=_portfolio_db()
+    try:
+        with con:
+            cur={r[0]: r[1:] for r in con.execute(
+                "SELECT id,name,ticker,account,quantity,pru FROM lines WHERE portfolio=? AND deleted=0", (name,))}
+            inserts, updates, seen = [], [], set()
+            for _,r in df.iterrows():
+                vals=_line_values(r)
+                lid=r.get("id")
+                if lid is None or pd.isna(lid) or int(lid) not in cur:
+                    if vals[1]: inserts.append(vals)
+                    continue
+                lid=int(lid); seen.add(lid)
+                if tuple(cur[lid])!=vals: updates.append((lid, vals))
+            _write_lines(con, name, inserts, updates, [i for i in cur if i not in seen])
+    finally: con.close()
+
+def reset_portfolio(name: str):
+    con=_portfolio_db()
+    try:
+        with con:
+            ids=[r[0] for r in con.execute("SELECT id FROM lines WHERE portfolio=? AND deleted=0", (name,))]
+            _write_lines(con, name, [], [], ids)
+    finally: con.close()
+
+# Portefeuille : valorisation vectorisée et courbe de valeur
+def portfolio_valuation(holdings: pd.DataFrame, metrics: pd.DataFrame):
+    """holdings (Ticker, Quantity, PRU, Account) + compute_metrics →
+    (lignes avec Value/Cost/PnL/PerfPct, synthèse par compte, synthèse totale)."""
+    lines=holdings.merge(metrics, on="Ticker", how="left") if not metrics.empty else holdings.copy()
+    px, pru = _num_col(lines, "Close"), _num_col(lines, "PRU")
+    q=np.nan_to_num(_num_col(lines, "Quantity"), nan=0.0)
+    priced=np.isfinite(px); costed=np.isfinite(pru) & (pru>0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        lines["Value"]=np.where(priced, px*q, 0.0)
+        lines["Cost"]=np.where(costed, pru*q, np.nan)
+        lines["PnL"]=np.where(priced & costed, px*q-pru*q, np.nan)
+        lines["PerfPct"]=np.where(priced & costed, (px-pru)/pru*100, np.nan)
+    # coût retenu pour la perf agrégée : seulement les lignes valorisées
+    lines["_cost_priced"]=np.where(priced & costed, pru*q, 0.0)
+    if "Account" not in lines.columns: lines["Account"]=""
+    def summary(g):
+        cost=g["_cost_priced"].sum()
+        return pd.Series({"Value":g["Value"].sum(), "Cost":g["Cost"].sum(min_count=1), "PnL":g["PnL"].sum(min_count=1),
+                          "PerfPct":(g["PnL"].sum()/cost*100) if cost>0 else np.nan, "Lines":len(g)})
+    by_account=pd.DataFrame([summary(g).rename(a) for a,g in lines.groupby(lines["Account"].fillna(""), sort=True)])
+    total=summary(lines).rename("Total")
+    return lines.drop(columns="_cost_priced"), by_account, total
+
+class EquityCurve:
+    """Valeur quotidienne du portefeuille (par compte + Total) et drawdown sur l’historique
+    de prix fourni. `update()` ne recalcule que la dernière date connue (barre révisée)
+    et les dates nouvelles ; le reste de la courbe est conservé."""
+    def __init__(self, holdings: pd.DataFrame):
+        h=holdings.dropna(subset=["Ticker"])
+        acc=h["Account"].fillna("") if "Account" in h.columns else pd.Series("", index=h.index)
+        q=pd.DataFrame({"Ticker":h["Ticker"], "Account":acc,
+                        "Quantity":np.nan_to_num(_num_col(h, "Quantity"), nan=0.0)})
+        self.qty=q.pivot_table(index="Ticker", columns="Account", values="Quantity", aggfunc="sum", fill_value=0.0)
+        self.tickers=list(self.qty.index)
+        self.closes=None  # Date × Ticker, prolongé (ffill)
+        self.curve=None   # Date × (comptes…, Total, Drawdown)
+
+    def update(self, prices: pd.DataFrame) -> pd.DataFrame:
+        if prices is None or prices.empty or not self.tickers: return self.curve
+        px=prices[prices["Ticker"].isin(self.tickers)]
+        wide=(px.drop_duplicates(["Date","Ticker"], keep="last")
+                .pivot(index="Date", columns="Ticker", values="Close").reindex(columns=self.tickers).sort_index())
+        if self.closes is not None and len(self.closes):
+            last=self.closes.index[-1]
+            wide=wide[wide.index>=last]
+            if wide.empty: return self.curve
+            if last in wide.index:  # barre révisée : on complète avec les cours déjà connus
+                wide.loc[last]=wide.loc[last].fillna(self.closes.loc[last])
+                head, curve_head = self.closes[self.closes.index<last], self.curve[self.curve.index<last]
+            else:
+                head, curve_head = self.closes, self.curve
+            seed=head.iloc[-1:]
+            tail=pd.concat([seed, wide]).ffill().iloc[len(seed):]
+        else:
+            head, curve_head = None, None
+            tail=wide.ffill()
+            # la courbe démarre quand toutes les lignes ayant un historique sont valorisées
+            known=tail.columns[tail.notna().any()]
+            tail=tail[tail[known].notna().all(axis=1).cummax()]
+            if tail.empty: return self.curve
+        vals=tail.fillna(0.0).to_numpy()@self.qty.to_numpy()
+        part=pd.DataFrame(vals, index=tail.index, columns=[str(c) for c in self.qty.columns])
+        part["Total"]=vals.sum(axis=1)
+        peak0=curve_head["Total"].max() if curve_head is not None and len(curve_head) else -np.inf
+        peak=np.maximum.accumulate(np.maximum(part["Total"].to_numpy(), peak0))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            part["Drawdown"]=np.where(peak>0, part["Total"].to_numpy()/peak-1, 0.0)
+        self.closes=tail if head is None else pd.concat([head, tail])
+        self.curve=part if curve_head is None else pd.concat([curve_head, part])
+        return self.curve
+
+# Recherche : index en mémoire (constituants, alias du mapping, lignes des portefeuilles)
+SEARCH_KINDS = {"ticker": 1.0, "alias": 1.0, "root": 0.95, "name": 0.9, "word": 0.8}
+cache_namespace("search", ttl=CONSTITUENTS_TTL, max_bytes=32*2**20)
+
+def _fold(s) -> str:
+    """Majuscules sans accents, espaces normalisés (comparaisons de recherche)."""
+    s=unicodedata.normalize("NFKD", str(s or "")).encode("ascii", "ignore").decode()
+    return " ".join(s.upper().split())
+
+def _trigrams(s: str) -> set:
+    s=f"  {s} "
+    return {s[i:i+3] for i in range(len(s)-2)}
+
+class SearchIndex:
+    """Suggestions instantanées : préfixe par bisection sur les termes triés (ticker, racine
+    sans suffixe, nom, mots du nom, alias ISIN/WKN/LS du mapping) puis, si besoin, similarité
+    de trigrammes (Jaccard) sur les noms et tickers. Une entrée par ticker Yahoo."""
+    def __init__(self, entries):
+        # entries : (ticker, nom, source, alias…)
+        self.tickers, self.names, self.sources = [], [], []
+        pos={}; terms=[]; grams={}
+        for ticker, name, source, *aliases in entries:
+            t=str(ticker or "").strip().upper()
+            if not t: continue
+            i=pos.get(t)
+            if i is None:
+                i=pos[t]=len(self.tickers); self.tickers.append(t); self.names.append(str(name or "")); self.sources.append([])
+            elif name and not self.names[i]: self.names[i]=str(name)
+            if source and source not in self.sources[i]: self.sources[i].append(source)
+            fname=_fold(name)
+            found=[(t, "ticker"), (t.split(".")[0], "root"), (fname, "name")]
+            found+=[(w, "word") for w in re.split(r"[^A-Z0-9]+", fname) if len(w)>=2]
+            found+=[(_fold(a), "alias") for a in aliases if a]
+            for term,kind in found:
+                if term: terms.append((term, kind, i))
+            for g in _trigrams(t.split(".")[0])|(_trigrams(fname) if fname else set()):
+                grams.setdefault(g, set()).add(i)
+        terms.sort()
+        kinds=list(SEARCH_KINDS)
+        self.keys=[x[0] for x in terms]
+        self.term_entry=np.array([x[2] for x in terms], dtype=np.int32)
+        self.term_kind=np.array([kinds.index(x[1]) for x in terms], dtype=np.int8)
+        self.term_len=np.array([len(x[0]) for x in terms], dtype=np.int32)
+        self.grams={g: np.fromiter(ids, dtype=np.int32) for g,ids in grams.items()}
+        # départage des ex æquo : tickers courts puis ordre alphabétique
+        self.rank=np.empty(len(self.tickers), dtype=np.int32)
+        self.rank[sorted(range(len(self.tickers)), key=lambda i: (len(self.tickers[i]), self.tickers[i]))]=np.arange(len(self.tickers))
+        self.gram_counts=np.zeros(len(self.tickers), dtype=np.int32)
+        for ids in self.grams.values(): self.gram_counts[ids]+=1
+
+    def __len__(self): return len(self.tickers)
+    def __sizeof__(self):
+        return (sys.getsizeof(self.keys)+sum(len(k)+49 for k in self.keys)+self.term_entry.nbytes*3+self.rank.nbytes*2
+                +sum(a.nbytes for a in self.grams.values()))
+
+    def search(self, query: str, k=8) -> list:
+        """[(ticker, nom, score, type de correspondance)] triés par pertinence."""
+        q=_fold(query)
+        if not q: return []
+        weights=np.array(list(SEARCH_KINDS.values()))
+        kinds=list(SEARCH_KINDS)
+        # préfixe : les termes commençant par q forment une plage contiguë de la liste triée
+        lo=bisect.bisect_left(self.keys, q); hi=bisect.bisect_left(self.keys, q+"\x7f", lo)
+        e=self.term_entry[lo:hi]; kind=self.term_kind[lo:hi]; w=weights[kind]
+        exact=self.term_len[lo:hi]==len(q)
+        score=np.where(exact, 100*w, 70*w+20*len(q)/self.term_len[lo:hi])
+        label=np.where(exact, kind, kind+len(kinds))
+        if len(q)>=3 and len(np.unique(e))<k:
+            qg=_trigrams(q)
+            counts=np.zeros(len(self.tickers), dtype=np.int32)
+            for g in qg:
+                ids=self.grams.get(g)
+                if ids is not None: counts[ids]+=1
+            cand=np.flatnonzero(counts*3>=len(qg))  # au moins 1/3 des trigrammes en commun
+            sim=counts[cand]/(len(qg)+self.gram_counts[cand]-counts[cand])
+            ok=sim>=0.2
+            e=np.concatenate([e, cand[ok]]); score=np.concatenate([score, 60*sim[ok]])
+            label=np.concatenate([label, np.full(ok.sum(), 2*len(kinds))])
+        if not len(e): return []
+        # k entrées distinctes parmi les m meilleurs termes suffisent : un terme hors de ces m
+        # ne peut battre le k-ième retenu (sinon on retombe sur le tri complet)
+        m=len(e)
+        for cut in (min(m, 8*k), m):
+            part=np.flatnonzero(score>=np.partition(score, m-cut)[m-cut])  # ex æquo inclus
+            order=part[np.lexsort((-score[part], e[part]))]  # meilleur terme de chaque entrée en tête
+            first=order[np.r_[True, e[order][1:]!=e[order][:-1]]]
+            if len(first)>=k: break
+        top=first[np.lexsort((self.rank[e[first]], -score[first]))[:k]]
+        names=kinds+[f"{x} (préfixe)" for x in kinds]+["approché"]
+        return [(self.tickers[e[j]], self.names[e[j]], round(float(score[j]), 1), names[label[j]]) for j in top]
+
+def _portfolio_tickers():
+    """(version du stockage, [(ticker, nom, portefeuille)]) ; vide si la base n’existe pas encore."""
+    if not os.path.exists(PORTFOLIO_DB_PATH): return 0, []
+    con=_portfolio_db()
+    try:
+        version=con.execute("SELECT value FROM meta WHERE key='version'").fetchone()[0]
+        rows=con.execute("SELECT DISTINCT ticker, name, portfolio FROM lines WHERE deleted=0 AND ticker<>''").fetchall()
+    finally: con.close()
+    return version, rows
+
+def search_index() -> SearchIndex:
+    """Index des constituants de tous les indices, des alias de id_mapping.json et des
+    tickers des portefeuilles ; reconstruit quand le mapping ou un portefeuille change."""
+    mapping=_MAPPING.get()
+    pf_version, pf_rows = _portfolio_tickers()
+    key=("index", _MAPPING.stamp, pf_version)
+    hit, idx = cache_get("search", key)
+    if hit: return idx
+    entries=[]
+    for name in INDEX_SOURCES:
+        mem=members(name)
+        entries+=zip(mem["ticker"], mem["name"], mem["index"])
+    aliases={}
+    for alias,t in mapping.items(): aliases.setdefault(str(t).upper(), []).append(alias)
+    entries+=[(t, "", "Alias", *a) for t,a in aliases.items()]
+    entries+=[(t, n, f"Portefeuille {p}") for t,n,p in pf_rows]
+    return cache_put("search", key, SearchIndex(entries))
+
+# Backtest : règles de décision et seuils de prix rejoués sur l’historique stocké, en
+# tableaux (dates × tickers) pour tous les profils à la fois
+BACKTEST_YEARS = 10
+BACKTEST_HORIZON = 20  # séances max. en position, sortie à la clôture au-delà
+_BACKTEST_CHUNK = 512  # tickers par bloc pour les indicateurs (float64)
+BACKTEST_EXITS = ("objectif", "stop", "durée")
+
+def _rolling_bars(a, w, min_periods):
+    """Moyenne des `w` dernières valeurs de chaque colonne, NaN ignorés (rolling(w, min_periods).mean())."""
+    v=~np.isnan(a)
+    cs=np.cumsum(np.where(v, a, 0.0), axis=0); cn=np.cumsum(v, axis=0)
+    s, n = cs.copy(), cn.copy()
+    s[w:]-=cs[:-w]; n[w:]-=cn[:-w]
+    with np.errstate(invalid="ignore", divide="ignore"): m=s/n
+    return np.where(n>=min_periods, m, np.nan)
+
+def backtest_signals(panel: PricePanel, profiles=None):
+    """Indicateurs de compute_metrics évalués à chaque barre → (base des seuils : MA20 sinon
+    Close, float32 dates × tickers ; signal « 🟢 Acheter » hors position, bool profils × dates × tickers).
+    Les barres de chaque ticker sont compactées en tête de colonne : les fenêtres comptent des
+    séances du ticker, pas des dates du calendrier commun."""
+    profiles=list(profiles or PROFILE_PARAMS)
+    close=panel.arrays["Close"]; D, T = close.shape
+    base=np.full((D, T), np.nan, dtype=np.float32)
+    buy=np.zeros((len(profiles), D, T), dtype=bool)
+    vol_max=np.array([get_profile_params(p)["vol_max"] for p in profiles])[:, None, None]
+    for j0 in range(0, T, _BACKTEST_CHUNK):
+        sl=slice(j0, j0+_BACKTEST_CHUNK)
+        order=np.argsort(np.isnan(close[:, sl]), axis=0, kind="stable")  # barres en tête, trous en fin
+        h, l, c = (np.take_along_axis(panel.arrays[f][:, sl], order, axis=0).astype(float) for f in ("High","Low","Close"))
+        prev=np.vstack([np.full((1, c.shape[1]), np.nan), c[:-1]])
+        tr=np.maximum(h-l, np.maximum(np.abs(h-prev), np.abs(l-prev)))
+        ma20, ma50, atr = _rolling_bars(c, 20, 5), _rolling_bars(c, 50, 10), _rolling_bars(tr, 14, 5)
+        # tous les profils d’un coup (vol_max diffusé), puis retour à l’ordre des dates
+        score=_decision_score_arrays(c, ma20, ma50, atr, np.nan, vol_max)
+        np.put_along_axis(base[:, sl], order, np.where(np.isnan(ma20), c, ma20), axis=0)
+        np.put_along_axis(buy[:, :, sl], np.broadcast_to(order, score.shape), score>0.3, axis=1)
+    return base, buy
+
+@timed("backtest", lambda out, panel, *a, **k: {"rows": int(panel.shape[0]*panel.shape[1]), "trades": len(out[1])})
+def backtest(panel: PricePanel, groups=None, profiles=None, horizon=BACKTEST_HORIZON):
+    """Rejoue « Décision IA » et les seuils de price_levels sur tout le panel, tous profils à la fois.
+
+    Un signal 🟢 Acheter (hors position) à la clôture place un ordre à `entry` pour la séance
+    suivante du ticker : exécuté si le plus bas l’atteint (à l’ouverture si elle est plus basse),
+    annulé sinon. En position : sortie au stop (prioritaire le même jour, hypothèse prudente),
+    à l’objectif, ou à la clôture après `horizon` séances ; une position au plus par ticker et profil.
+    Chaque groupe (indice) est un portefeuille équipondéré de ses membres cotés, liquidités à 0 %.
+
+    → (synthèse par profil et groupe, transactions, rendement cumulé quotidien par (profil, groupe))."""
+    profiles=list(profiles or PROFILE_PARAMS)
+    groups=groups or {"Tous": list(panel.tickers)}
+    P, (D, T) = len(profiles), panel.shape
+    base, buy = backtest_signals(panel, profiles)
+    mult={k: np.array([get_profile_params(p)[f"{k}_mult"] for p in profiles])[:, None] for k in ("entry","target","stop")}
+    G=np.zeros((T, len(groups)))
+    for g,tk in enumerate(groups.values()):
+        j=panel.tickers.get_indexer(list(tk)); G[j[j>=0], g]=1
+    state=np.zeros((P, T), dtype=np.int8)  # 0 sans position, 1 ordre en attente, 2 en position
+    entry, target, stop, fill, mark = (np.full((P, T), np.nan) for _ in range(5))
+    held=np.zeros((P, T), dtype=np.int32); opened=np.zeros((P, T), dtype=np.int32)
+    daily=np.zeros((D, P, len(groups))); exposed=np.zeros((P, len(groups))); listed=np.zeros(len(groups))
+    trades=[]
+    O, H, L, C = (np.asarray(panel.arrays[f]) for f in ("Open","High","Low","Close"))  # memmap → ndarray (accès par ligne)
+    with np.errstate(invalid="ignore"):
+        for d in range(D):
+            c=C[d].astype(float); valid=~np.isnan(c)
+            if not valid.any(): continue
+            o=np.where(np.isnan(O[d]), c, O[d]); h=np.where(np.isnan(H[d]), c, H[d]); l=np.where(np.isnan(L[d]), c, L[d])
+            # ordres de la veille
+            pend=(state==1) & valid
+            filled=pend & (l<=entry)
+            px=np.minimum(o, entry)
+            fill=np.where(filled, px, fill); mark=np.where(filled, px, mark)
+            opened=np.where(filled, d, opened); held=np.where(filled, 0, held)
+            state=np.where(filled, 2, np.where(pend, 0, state)).astype(np.int8)
+            # positions
+            pos=(state==2) & valid
+            held=held+(pos & ~filled)
+            ref=np.where(filled, fill, o)  # prix de référence pour les ordres touchés en ouverture
+            out_stop=pos & (l<=stop)
+            out_target=pos & ~out_stop & (h>=target)
+            out_time=pos & ~out_stop & ~out_target & (held>=horizon)
+            out=out_stop | out_target | out_time
+            exit_px=np.where(out_stop, np.minimum(ref, stop), np.where(out_target, np.maximum(ref, target), c))
+            ret=np.where(pos, np.where(out, exit_px, c)/mark-1, 0.0)
+            mark=np.where(pos, c, mark)
+            if out.any():
+                p_, t_ = np.nonzero(out)
+                trades.append((p_, t_, opened[p_, t_], np.full(len(p_), d), fill[p_, t_], exit_px[p_, t_],
+                                np.where(out_target[p_, t_], 0, np.where(out_stop[p_, t_], 1, 2))))
+            state=np.where(out, 0, state).astype(np.int8)
+            # signaux de clôture → ordres pour la séance suivante
+            sig=(state==0) & buy[:, d] & valid
+            if sig.any():
+                p_, t_ = np.nonzero(sig)
+                b=base[d, t_].astype(float)
+                for k,a in (("entry", entry), ("target", target), ("stop", stop)):
+                    a[p_, t_]=_round2(b*mult[k][p_, 0])
+                state[sig]=1
+            n=valid@G
+            daily[d]=(ret@G)/np.where(n>0, n, 1)
+            exposed+=pos.astype(float)@G; listed+=n
+    cols=["p","t","i","o","fill","exit","why"]
+    tr=pd.DataFrame(dict(zip(cols, map(np.concatenate, zip(*trades))))) if trades else pd.DataFrame(columns=cols)
+    trades=pd.DataFrame({
+        "Profil": np.array(profiles, dtype=object)[tr["p"].astype(int)], "Ticker": panel.tickers[tr["t"].astype(int)],
+        "Entrée": panel.dates[tr["i"].astype(int)], "Sortie": panel.dates[tr["o"].astype(int)],
+        "Prix entrée": tr["fill"].astype(float), "Prix sortie": tr["exit"].astype(float),
+        "Rendement": tr["exit"].astype(float)/tr["fill"].astype(float)-1,
+        "Séances": tr["o"].astype(int)-tr["i"].astype(int),
+        "Sortie par": np.array(BACKTEST_EXITS, dtype=object)[tr["why"].astype(int)],
+    })
+    equity=pd.DataFrame(np.cumprod(1+daily, axis=0).reshape(D, -1), index=panel.dates,
+                        columns=pd.MultiIndex.from_product([profiles, list(groups)], names=["Profil","Groupe"]))
+    rows=[]
+    for g,(name,tk) in enumerate(groups.items()):
+        inside=trades["Ticker"].isin(set(tk))
+        for p,prof in enumerate(profiles):
+            t=trades.loc[inside & (trades["Profil"]==prof)]
+            eq=equity[(prof, name)].to_numpy()
+            rows.append({"Profil": prof, "Groupe": name, "Transactions": len(t),
+                         "Taux de réussite": (t["Rendement"]>0).mean() if len(t) else np.nan,
+                         "Objectifs": (t["Sortie par"]=="objectif").mean() if len(t) else np.nan,
+                         "Stops": (t["Sortie par"]=="stop").mean() if len(t) else np.nan,
+                         "Rendement moyen": t["Rendement"].mean() if len(t) else np.nan,
+                         "Séances moyennes": t["Séances"].mean() if len(t) else np.nan,
+                         "Rendement cumulé": eq[-1]-1 if D else np.nan,
+                         "Drawdown max": float(np.max(1-eq/np.maximum.accumulate(eq))) if D else np.nan,
+                         "Exposition": exposed[p, g]/listed[g] if listed[g] else np.nan})
+    return pd.DataFrame(rows), trades, equity
+
+def backtest_markets(markets=None, years=BACKTEST_YEARS, **kw):
+    """backtest() sur l’historique stocké des constituants, un groupe par indice."""
+    plan, union = _plan_market_fetch(markets or ALL_MARKETS)
+    panel=fetch_panel(union, days=int(years*365.25)) if union else PricePanel.from_long(None)
+    return backtest(panel, {idx: list(mem["ticker"]) for idx,mem in plan}, **kw)
@@ -1,35 +1,34 @@
 
 # -*- coding: utf-8 -*-
 import streamlit as st, pandas as pd, numpy as np, altair as alt
-from lib import fetch_all_markets, news_summary, decision_label_from_row, style_variations, get_profile_params, price_levels_from_row
+from lib import market_pipeline, snapshot_age, ai_table, set_ai_news, style_variations, invalidate, ALL_MARKETS
 
 st.title("🌍 Marché Global — Résumé IA & Top/Low (avec seuils)")
 
 profil = st.session_state.get("profil","Neutre")
-volmax = get_profile_params(profil)["vol_max"]
 
 periode = st.radio("Période", ["Jour","7 jours","30 jours"], index=0, horizontal=True)
 days_hist = {"Jour":60,"7 jours":90,"30 jours":150}[periode]
 value_col = {"Jour":"pct_1d","7 jours":"pct_7d","30 jours":"pct_30d"}[periode]
 
 if st.sidebar.button("🔄 Rafraîchir cette page"):
-    st.cache_data.clear(); st.rerun()
+    invalidate("prices"); invalidate("news"); invalidate("snapshots"); st.rerun()
 
-MARKETS_AND_WL=[("CAC 40",""),("DAX 40",""),("NASDAQ 100",""),("S&P 500",""),("Dow Jones","")]
-data = fetch_all_markets(MARKETS_AND_WL, days_hist=days_hist)
-if data.empty: st.warning("Aucune donnée disponible."); st.stop()
-if value_col not in data.columns: st.warning("Pas de variations calculables."); st.stop()
-
-valid=data.dropna(subset=[value_col]).copy()
-avg = valid[value_col].mean()*100
-up = int((valid[value_col]>0).sum())
-dn = int((valid[value_col]<0).sum())
-st.markdown(f"**Résumé global ({periode})** — Variation moyenne : {avg:.2f}% — {up} hausses / {dn} baisses")
+# rendu progressif : chaque zone a sa place réservée et se remplit quand son étape arrive
+summary = st.empty()
+age = st.empty()
+c1,c2=st.columns(2)
+charts = {"top": c1.empty(), "low": c2.empty()}
 
-top=valid.sort_values(value_col, ascending=False).head(5)
-low=valid.sort_values(value_col, ascending=True).head(5)
+def show_summary(data, loaded):
+    valid=data.dropna(subset=[value_col]) if value_col in data.columns else data.iloc[:0]
+    avg = valid[value_col].mean()*100 if not valid.empty else float("nan")
+    up = int((valid[value_col]>0).sum()) if not valid.empty else 0
+    dn = int((valid[value_col]<0).sum()) if not valid.empty else 0
+    pending = "" if loaded>=len(ALL_MARKETS) else f" — ⏳ {loaded}/{len(ALL_MARKETS)} indices"
+    summary.markdown(f"**Résumé global ({periode})** — Variation moyenne : {avg:.2f}% — {up} hausses / {dn} baisses{pending}")
 
-def bar(df, title):
+def bar(ph, df, title):
     d=df.copy()
     d["Name"]=d.get("name", d.get("Ticker","")).astype(str)
     d["pct"]=d[value_col]*100
@@ -40,28 +39,36 @@ def bar(df, title):
         color=alt.Color("color:N", scale=alt.Scale(domain=["Hausses","Baisses"], range=["#2bb673","#e55353"]), legend=None),
         tooltip=["Name","Ticker",alt.Tooltip("pct",format=".2f")]
     ).properties(title=title, height=300)
-    st.altair_chart(ch, use_container_width=True)
+    ph.altair_chart(ch, use_container_width=True)
 
-c1,c2=st.columns(2)
-with c1: bar(top, "Top 5 hausses")
-with c2: bar(low, "Top 5 baisses")
-
-def table_ai(df):
-    rows=[]
-    for _,r in df.iterrows():
-        name=r.get("name", r.get("Ticker"))
-        tick=r.get("Ticker","")
-        levels=price_levels_from_row(r, profil)
-        txt,score,_=news_summary(str(name), tick)
-        dec=decision_label_from_row(r, held=False, vol_max=volmax)
-        rows.append({"Nom":name,"Ticker":tick,"Var%":round((r.get(value_col,0) or 0)*100,2),
-                     "Entrée (€)":levels["entry"],"Objectif (€)":levels["target"],"Stop (€)":levels["stop"],
-                     "Décision IA":dec,"Actu (résumé)":txt,"Sentiment":round(score,2)})
-    return pd.DataFrame(rows)
+def show_table(side):
+    tables_ph[side].dataframe(style_variations(tables[side], ["Var%","Sentiment"]), use_container_width=True, hide_index=True)
 
 st.subheader("Analyses IA — Top")
-df_top = table_ai(top)
-st.dataframe(style_variations(df_top, ["Var%","Sentiment"]), use_container_width=True, hide_index=True)
+tables_ph = {"top": st.empty()}
 st.subheader("Analyses IA — Low")
-df_low = table_ai(low)
-st.dataframe(style_variations(df_low, ["Var%","Sentiment"]), use_container_width=True, hide_index=True)
+tables_ph["low"] = st.empty()
+
+frames, late, tables = [], [], {}
+for ev in market_pipeline(days_hist, value_col):
+    if ev.stage=="index":
+        if ev.value is None: late.append(ev.key)
+        elif not ev.value.empty: frames.append(ev.value)
+        if frames: show_summary(pd.concat(frames, ignore_index=True), len(frames))
+        else: summary.info("⏳ Chargement des indices…")
+    elif ev.stage=="movers":
+        data = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        if data.empty: summary.warning("Aucune donnée disponible."); st.stop()
+        if value_col not in data.columns: summary.warning("Pas de variations calculables."); st.stop()
+        show_summary(data, len(ALL_MARKETS))
+        top, low = ev.value
+        bar(charts["top"], top, "Top 5 hausses"); bar(charts["low"], low, "Top 5 baisses")
+        tables = {"top": ai_table(top, value_col, profil), "low": ai_table(low, value_col, profil)}
+        for side in tables: show_table(side)
+    elif ev.stage=="news":
+        side, i = ev.key
+        set_ai_news(tables[side], i, ev.value)
+        show_table(side)
+    elif ev.stage=="done":
+        age.caption(f"Données calculées il y a {snapshot_age(ev.value)/60:.0f} min.")
+        if late: st.caption(f"⏱️ Hors délai, absents de ce calcul : {', '.join(late)}.")
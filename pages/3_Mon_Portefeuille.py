@@ -1,8 +1,9 @@
 
 # -*- coding: utf-8 -*-
-import streamlit as st, pandas as pd, numpy as np, os
-from lib import (fetch_prices, compute_metrics, decision_label_from_row, resolve_identifier,
-                 load_mapping, save_mapping, get_profile_params, style_variations, price_levels_from_row, guess_yahoo_from_ls)
+import streamlit as st, pandas as pd, altair as alt
+from lib import (fetch_panel, compute_metrics, decision_labels, resolve_identifier, price_history,
+                 set_mapping, get_profile_params, style_variations, price_levels, guess_yahoo_from_ls, invalidate,
+                 portfolio_valuation, EquityCurve, sync_portfolio, add_portfolio_line, save_portfolio, reset_portfolio)
 
 st.title("💼 Mon Portefeuille — Multi-profils, Convertisseur LS→Yahoo & Seuils IA")
 
@@ -11,12 +12,12 @@ volmax = get_profile_params(profil)["vol_max"]
 
 st.sidebar.subheader("💾 Portefeuilles")
 profile_name = st.sidebar.selectbox("Portefeuille actif", ["PEA","CTO","Global (personnalisé)"], index=0)
-PATH=f"data/portfolio_{'PEA' if profile_name=='PEA' else 'CTO' if profile_name=='CTO' else 'GLOBAL'}.json"
+PF = 'PEA' if profile_name=='PEA' else 'CTO' if profile_name=='CTO' else 'GLOBAL'
+STATE = f"port_state_{PF}"
 
-if not os.path.exists(PATH):
-    pd.DataFrame(columns=["Name","Ticker","Account","Quantity","PRU"]).to_json(PATH, orient="records", indent=2, force_ascii=False)
-
-port = pd.read_json(PATH)
+# seules les lignes modifiées depuis le dernier chargement sont relues
+st.session_state[STATE] = sync_portfolio(PF, st.session_state.get(STATE))
+port = st.session_state[STATE][0]
 
 st.subheader("🔁 Convertisseur LS Exchange → Yahoo")
 ls = st.text_input("Ticker LS (ex: AIR, ORA, MC, TTE, BN)")
@@ -25,7 +26,7 @@ if ls:
     st.write(f"Proposition : **{guess or '—'}**")
     if st.button("✅ Enregistrer cette correspondance"):
         if guess:
-            m = load_mapping(); m[ls.upper()] = guess; save_mapping(m)
+            set_mapping(ls, guess)
             st.success(f"Association enregistrée : {ls.upper()} → {guess}")
         else:
             st.warning("Aucune proposition valable.")
@@ -43,7 +44,7 @@ with st.form("add_line"):
             st.warning("Ticker Yahoo introuvable. Indique-le manuellement :")
             tick = st.text_input("Ticker Yahoo (ex: AIR.PA, AAPL, TTE.PA)", key="manual_ticker_add")
             if tick:
-                mapping = load_mapping(); mapping[raw_id.upper()] = tick.upper(); save_mapping(mapping)
+                set_mapping(raw_id, tick.upper())
                 st.info("Correspondance enregistrée.")
         if tick:
             import yfinance as yf
@@ -55,48 +56,66 @@ with st.form("add_line"):
                 info = {}
             name = info.get("shortName") or info.get("longName") or tick
             new_row = {"Name":name, "Ticker":tick.upper(), "Account":account, "Quantity":qty, "PRU":pru}
-            port = pd.concat([port, pd.DataFrame([new_row])], ignore_index=True)
-            port.to_json(PATH, orient="records", indent=2, force_ascii=False)
+            add_portfolio_line(PF, new_row)
+            st.session_state[STATE] = sync_portfolio(PF, st.session_state[STATE])
+            port = st.session_state[STATE][0]
             st.success(f"Ligne ajoutée : {name} ({tick})")
 
 st.subheader("Éditeur du portefeuille")
-edited = st.data_editor(port, num_rows="dynamic", use_container_width=True, key=f"port_editor_{profile_name}")
+edited = st.data_editor(port, num_rows="dynamic", use_container_width=True, key=f"port_editor_{profile_name}",
+                        column_config={"id": None})
 
 c1,c2,c3=st.columns(3)
 with c1:
     if st.button("💾 Sauvegarder"):
-        edited.to_json(PATH, orient="records", indent=2, force_ascii=False)
+        save_portfolio(PF, edited)
+        st.session_state[STATE] = sync_portfolio(PF, st.session_state[STATE])
         st.success("Sauvegardé.")
 with c2:
     if st.button("🗑 Réinitialiser ce portefeuille"):
-        if os.path.exists(PATH): os.remove(PATH)
+        reset_portfolio(PF)
         for k in list(st.session_state.keys()):
             if k.startswith("port_editor_"): del st.session_state[k]
         st.rerun()
 with c3:
     if st.button("🔄 Rafraîchir données"):
-        st.cache_data.clear(); st.rerun()
+        invalidate("prices"); st.rerun()
 
 if edited.empty:
     st.info("Ajoutez des lignes (Ticker requis)."); st.stop()
 
 tickers = edited["Ticker"].dropna().unique().tolist()
-data = fetch_prices(tickers, days=90)
-met = compute_metrics(data)
-merged = edited.merge(met, on="Ticker", how="left")
+met = compute_metrics(fetch_panel(tickers, days=90))
+lines, by_account, total = portfolio_valuation(edited, met)
 
-rows=[]
-for _,r in merged.iterrows():
-    px=float(r.get("Close", np.nan)); q=float(r.get("Quantity",0) or 0); pru=float(r.get("PRU", np.nan) or np.nan)
-    levels = price_levels_from_row(r, profil)
-    val = (px*q) if np.isfinite(px) else 0.0
-    perf = ((px-pru)/pru*100) if (np.isfinite(px) and np.isfinite(pru) and pru>0) else np.nan
-    dec = decision_label_from_row(r, held=True, vol_max=volmax)
-    rows.append({"Compte":r.get("Account",""),"Nom":r.get("Name", r.get("Ticker","")), "Ticker":r.get("Ticker",""),
-                 "Cours":round(px,2) if np.isfinite(px) else None, "PRU":pru, "Qté":q, "Valeur":round(val,2),
-                 "Perf%":round(perf,2) if np.isfinite(perf) else None, "Entrée (€)":levels["entry"],
-                 "Objectif (€)":levels["target"], "Stop (€)":levels["stop"], "Décision IA":dec})
-out=pd.DataFrame(rows)
+levels = price_levels(lines, profil)
+out = pd.DataFrame({"Compte":lines["Account"].to_numpy(), "Nom":lines.get("Name", lines["Ticker"]).to_numpy(),
+                    "Ticker":lines["Ticker"].to_numpy(), "Cours":lines["Close"].astype(float).round(2).to_numpy() if "Close" in lines else None,
+                    "PRU":lines["PRU"].to_numpy(), "Qté":lines["Quantity"].to_numpy(), "Valeur":lines["Value"].round(2).to_numpy(),
+                    "Perf%":lines["PerfPct"].round(2).to_numpy(), "Entrée (€)":levels["entry"].to_numpy(),
+                    "Objectif (€)":levels["target"].to_numpy(), "Stop (€)":levels["stop"].to_numpy(),
+                    "Décision IA":decision_labels(lines, held=True, vol_max=volmax).to_numpy()})
 
 st.subheader("Vue portefeuille")
+cols = st.columns(len(by_account)+1)
+for col,(name,row) in zip(cols, list(by_account.iterrows())+[("Total", total)]):
+    col.metric(name or "—", f"{row['Value']:,.2f} €".replace(",", " "),
+               None if pd.isna(row["PerfPct"]) else f"{row['PerfPct']:+.2f} %")
 st.dataframe(style_variations(out, ["Perf%"]), use_container_width=True, hide_index=True)
+
+st.subheader("Historique de valeur")
+sig = (profile_name, tuple(map(tuple, edited[["Ticker","Account","Quantity"]].astype(str).to_numpy())))
+if st.session_state.get("equity_sig") != sig:
+    st.session_state["equity_sig"] = sig
+    st.session_state["equity_curve"] = EquityCurve(edited)
+curve = st.session_state["equity_curve"].update(price_history(tickers))
+if curve is None or curve.empty:
+    st.caption("Historique indisponible.")
+else:
+    d = curve.reset_index().rename(columns={curve.index.name or "index":"Date"})
+    val = alt.Chart(d).mark_line(color="#2bb673").encode(x=alt.X("Date:T", title=""), y=alt.Y("Total:Q", title="Valeur (€)"),
+                                                         tooltip=["Date:T", alt.Tooltip("Total:Q", format=",.2f")]).properties(height=260)
+    dd = alt.Chart(d).mark_area(color="#e55353", opacity=0.5).encode(x=alt.X("Date:T", title=""), y=alt.Y("Drawdown:Q", title="Drawdown", axis=alt.Axis(format="%")),
+                                                                     tooltip=["Date:T", alt.Tooltip("Drawdown:Q", format=".2%")]).properties(height=140)
+    st.altair_chart(alt.vconcat(val, dd), use_container_width=True)
+    st.caption(f"Drawdown maximal : {curve['Drawdown'].min():.2%} — depuis le {curve.index[0]:%d/%m/%Y}")
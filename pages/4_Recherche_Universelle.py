@@ -1,7 +1,7 @@
 
 # -*- coding: utf-8 -*-
-import streamlit as st, pandas as pd, altair as alt, numpy as np, yfinance as yf
-from lib import (resolve_identifier, load_mapping, save_mapping, compute_metrics, news_summary,
+import streamlit as st, pandas as pd, altair as alt, numpy as np
+from lib import (resolve_identifier, set_mapping, compute_metrics, news_summary, search_index, price_history,
                  decision_label_from_row, get_profile_params, price_levels_from_row, guess_yahoo_from_ls)
 
 st.title("🔎 Recherche Universelle (Nom / Ticker / ISIN / WKN) — avec seuils & MA")
@@ -16,20 +16,26 @@ if ls:
     st.write(f"Proposition : **{guess or '—'}**")
     if st.button("✅ Enregistrer cette correspondance"):
         if guess:
-            m = load_mapping(); m[ls.upper()] = guess; save_mapping(m)
+            set_mapping(ls, guess)
             st.success(f"Association enregistrée : {ls.upper()} → {guess}")
         else:
             st.warning("Aucune proposition valable.")
 
-raw = st.text_input("Identifiant (ex: AIR.PA, AAPL, US0378331005, TOTB)").strip().upper()
+raw = st.text_input("Nom, ticker ou identifiant (ex: Airbus, AIR.PA, AAPL, US0378331005, TOTB)").strip().upper()
 if not raw: st.stop()
 
-tick, meta = resolve_identifier(raw)
+# suggestions locales (constituants, alias, portefeuilles) ; l’identifiant brut reste proposé en dernier
+hits = search_index().search(raw, k=8)
+choices = [t for t,_,_,_ in hits] + ([raw] if raw not in {t for t,_,_,_ in hits} else [])
+labels = {t: f"{n or t} ({t}) — {k}" for t,n,_,k in hits}
+pick = st.selectbox("Suggestions", choices, format_func=lambda t: labels.get(t, f"{t} — identifiant saisi"))
+
+tick, meta = (pick, {"source": "index"}) if pick in labels else resolve_identifier(raw)
 if not tick:
     st.warning("Identifiant non reconnu automatiquement.")
     manual = st.text_input("Indiquez le ticker Yahoo à associer :", key="manual_search")
     if manual:
-        mapping = load_mapping(); mapping[raw] = manual.upper(); save_mapping(mapping)
+        set_mapping(raw, manual.upper())
         tick = manual.upper()
         st.success(f"Association enregistrée : {raw} → {tick}")
 
@@ -38,17 +44,18 @@ if not tick: st.stop()
 st.info(f"Analyse de **{tick}**")
 
 try:
-    h = yf.download(tick, period="70d", interval="1d", auto_adjust=False, progress=False)
+    h = price_history([tick], min_days=90)
 except Exception as e:
     st.error(f"Impossible de récupérer l'historique: {e}"); st.stop()
 if h.empty:
     st.warning("Aucune donnée pour ce ticker."); st.stop()
 
-d = h.tail(30).copy().reset_index()
+d = h.copy()
 d["MA20"] = d["Close"].rolling(20, min_periods=5).mean()
 d["MA50"] = d["Close"].rolling(50, min_periods=10).mean()
+d = d.tail(30)
 
-m = compute_metrics(h.assign(Ticker=tick))
+m = compute_metrics(h)
 if not m.empty:
     row = m.tail(1).iloc[0]
 else:
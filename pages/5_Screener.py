@@ -0,0 +1,47 @@
+
+# -*- coding: utf-8 -*-
+import streamlit as st, pandas as pd
+from lib import (market_snapshot, snapshot_age, screener_table, style_variations, price_levels,
+                 SCREENER_METRICS, INDEX_SOURCES, invalidate)
+
+st.title("🧮 Screener — Tout l’univers (CAC 40, DAX 40, NASDAQ 100, S&P 500, Dow Jones)")
+
+profil = st.session_state.get("profil","Neutre")
+
+if st.sidebar.button("🔄 Rafraîchir le screener"):
+    invalidate("prices"); invalidate("snapshots"); invalidate("screener"); st.rerun()
+
+snap = market_snapshot(90)
+table = screener_table(snap)
+if not len(table): st.warning("Aucune donnée disponible."); st.stop()
+st.caption(f"{len(table)} valeurs — données calculées il y a {snapshot_age(snap)/60:.0f} min.")
+
+c1,c2,c3 = st.columns([2,1,1])
+with c1: metric = st.selectbox("Classer par", list(SCREENER_METRICS), format_func=SCREENER_METRICS.get)
+with c2: sens = st.radio("Ordre", ["Plus hauts","Plus bas"], horizontal=True)
+with c3: k = st.number_input("Nombre de lignes", min_value=min(5, len(table)), max_value=len(table),
+                           value=min(25, len(table)), step=5)
+
+c1,c2,c3 = st.columns(3)
+with c1: indices = st.multiselect("Indices", list(INDEX_SOURCES))
+with c2: decisions = st.multiselect(f"Décision IA ({profil})", ["🟢 Acheter","👁️ Surveiller","🚫 Éviter"])
+with c3:
+    lo = st.number_input(f"{SCREENER_METRICS[metric]} min (%)", value=None, step=0.5)
+    hi = st.number_input(f"{SCREENER_METRICS[metric]} max (%)", value=None, step=0.5)
+
+mask = table.mask(indices=indices, decisions=decisions, profile=profil,
+                  ranges={metric: (None if lo is None else lo/100, None if hi is None else hi/100)})
+res = table.top(metric, k=int(k), ascending=(sens=="Plus bas"), mask=mask)
+st.markdown(f"**{int(mask.sum())}** valeurs correspondent aux filtres.")
+
+levels = price_levels(res, profil)
+out = pd.DataFrame({
+    "Nom": res["name"].to_numpy(), "Ticker": res["Ticker"].to_numpy(), "Indice": res["Indice"].to_numpy(),
+    "Cours": res["Close"].astype(float).round(2).to_numpy(),
+    **{lbl: (res[m]*100).round(2).to_numpy() for m,lbl in [("pct_1d","Var% 1j"),("pct_7d","Var% 7j"),("pct_30d","Var% 30j")]},
+    "ATR%": (res["atr_pct"]*100).round(2).to_numpy(),
+    "vs MA20 %": (res["dist_ma20"]*100).round(2).to_numpy(), "vs MA50 %": (res["dist_ma50"]*100).round(2).to_numpy(),
+    "Entrée (€)": levels["entry"].to_numpy(), "Objectif (€)": levels["target"].to_numpy(), "Stop (€)": levels["stop"].to_numpy(),
+    "Décision IA": res[f"decision_{profil}"].to_numpy(),
+})
+st.dataframe(style_variations(out, ["Var% 1j","Var% 7j","Var% 30j","vs MA20 %","vs MA50 %"]), use_container_width=True, hide_index=True)
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""Reconstruit les instantanés de marché (data/snapshots/) hors Streamlit.
+
+    python snapshot_worker.py                  # une passe, pour cron
+    python snapshot_worker.py --loop 900       # boucle toutes les 900 s
+    python snapshot_worker.py --days 60 150    # seulement certains days_hist
+
+Lancer les pages avec DASH_SNAPSHOT_REFRESHER=0 pour désactiver le thread intégré.
+"""
+import argparse, time
+from lib import refresh_snapshots, SNAPSHOT_DAYS
+
+
+def main():
+    ap=argparse.ArgumentParser()
+    ap.add_argument("--days", type=int, nargs="+", default=list(SNAPSHOT_DAYS))
+    ap.add_argument("--loop", type=float, default=None, help="intervalle en secondes (sinon une seule passe)")
+    args=ap.parse_args()
+    while True:
+        t0=time.time()
+        paths=refresh_snapshots(args.days)
+        print(f"{len(paths)} instantané(s) publiés en {time.time()-t0:.1f} s : {', '.join(paths) or '—'}", flush=True)
+        if args.loop is None: break
+        time.sleep(max(0.0, args.loop-(time.time()-t0)))
+
+
+if __name__ == "__main__":
+    main()